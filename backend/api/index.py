@@ -49,7 +49,7 @@ def setup_db():
     """
     try:
         with app.app_context():
-            db.create_all()
+            db.create_all(bind_key=None)  # primary only; replicas get the schema through replication
             seed_database_internal()
         return {"status": "success", "message": "Database schema and seeds applied."}, 200
     except Exception as e:
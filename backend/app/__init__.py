@@ -1,45 +1,32 @@
 import os
 import logging
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_cors import CORS
-from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
+from app.database import db, configure_database
 
-# Initialize extensions at the module level
+# Everything only the management API needs (CORS, JWT, admission control, query budgets)
+# is imported inside create_app, so the evaluation server (app/eval_server.py) never loads it.
 load_dotenv()
-db = SQLAlchemy()
-migrate = Migrate()
-jwt = JWTManager()
 
 def create_app():
+    from flask_cors import CORS
+    from app.routes.auth_routes import jwt
+    from app.utils.db_routing import router as replica_router
+    from app.utils.db_pool import warm_pool, pool_stats
+    from app.utils.db_embedded import is_in_memory
+    from app.utils.admission import evaluation_guard
+    from app.utils import query_budget
+    from app.utils.helpers import configure_logging
+
     app = Flask(__name__)
     
     # Configure Logging for Vercel
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
+    configure_logging()
 
     # --- 1. Database Configuration ---
-    # Railway Public URL often starts with postgres://; SQLAlchemy 2.0 requires postgresql://
-    db_url = os.getenv('DATABASE_URL')
-    if db_url and db_url.startswith("postgres://"):
-        db_url = db_url.replace("postgres://", "postgresql://", 1)
-    
-    if not db_url:
-        logger.error("PRODUCTION CRITICAL: DATABASE_URL is missing!")
-    else:
-        # Log a masked version to verify the variable is being read in Vercel
-        logger.info(f"Database URI detected: {db_url[:15]}...{db_url[-5:]}")
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    # Essential for Serverless: Prevents crashes due to dropped connections
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        "pool_pre_ping": True,
-        "pool_recycle": 280, # Set slightly below Railway's 300s timeout
-    }
+    db_url, embedded, pool_profile = configure_database(app, logger)
 
     # --- 2. Security Configuration ---
     jwt_key = os.getenv('JWT_SECRET_KEY')
@@ -54,28 +41,83 @@ def create_app():
         "https://better-job-assignment-dfwp.vercel.app" 
     ]
 
-    CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
+    # Paging headers and ETags must be exposed or browsers hide them from the dashboard
+    CORS(app, resources={r"/api/*": {"origins": allowed_origins}}, expose_headers=["X-Next-Cursor", "Link", "ETag"])
 
-    db.init_app(app)
-    migrate.init_app(app, db)
+    # Imported here so processes that never migrate (e.g. the evaluation server) skip alembic
+    from flask_migrate import Migrate
+    Migrate(app, db)
     jwt.init_app(app)
 
+    # In-memory SQLite shares one connection, which background writer threads must never
+    # use concurrently with requests: there, traces are off and telemetry is written inline.
+    in_memory = embedded and is_in_memory(db_url)
+
+    # AI call traces are buffered in memory and bulk-inserted by a background writer
+    from app.services.ai_tracing import trace_recorder
+    trace_recorder.interval = float(os.getenv('AI_TRACE_FLUSH_INTERVAL', trace_recorder.interval))
+    trace_recorder.init_app(app, enabled=not in_memory)
+
+    # Evaluation telemetry goes through a single background writer in embedded (file) mode,
+    # where SQLite serializes writers. TELEMETRY_WRITER=queued|inline overrides.
+    from app.services.telemetry_writer import telemetry_writer
+    writer_mode = os.getenv('TELEMETRY_WRITER') or ("queued" if embedded and not in_memory else "inline")
+    if in_memory and writer_mode == "queued":
+        logger.warning("TELEMETRY_WRITER=queued is not supported on in-memory SQLite; writing telemetry inline")
+        writer_mode = "inline"
+    telemetry_writer.init_app(app, enabled=writer_mode == "queued")
+
+    # Inline mode still batches unique-user reach: sketches merge in-process, then flush
+    from app.services.evaluation import reach_buffer
+    reach_buffer.interval = float(os.getenv('REACH_FLUSH_INTERVAL', reach_buffer.interval))
+    reach_buffer.init_app(app, background=not in_memory)
+
+    evaluation_guard.init_app(app)
+
+    from app.services.risk_heatmap import heatmap
+    heatmap.ttl = float(os.getenv('RISK_HEATMAP_TTL', heatmap.ttl))
+
+    from app.services.dashboard import dashboard
+    dashboard.ttl = float(os.getenv('DASHBOARD_SUMMARY_TTL', dashboard.ttl))
+    dashboard.traffic_ttl = float(os.getenv('DASHBOARD_TRAFFIC_TTL', dashboard.traffic_ttl))
+
+    # Per-request SQL statement budgets (N+1 guard). See app/utils/query_budget.py.
+    query_budget.init_app(app)
+
+    warmup = int(os.getenv('DB_POOL_WARMUP', 0))
+    if warmup and pool_profile == "server" and db_url:
+        with app.app_context():
+            logger.info(f"Pool warm-up: {warm_pool(db.engine, warmup)} connections ready")
+
     with app.app_context():
         # Deferred imports to prevent circular dependency crashes
         from app.routes.flag_routes import flags_bp
         from app.routes.ai_routes import ai_bp
         from app.routes.auth_routes import auth_bp
+        from app.routes.webhook_routes import webhooks_bp
         
         app.register_blueprint(flags_bp, url_prefix='/api/flags')
         app.register_blueprint(ai_bp, url_prefix='/api/ai')
         app.register_blueprint(auth_bp, url_prefix='/api/auth')
+        app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
 
         @app.route('/')
         def health_check():
             return {
                 "status": "online", 
                 "environment": os.getenv('FLASK_ENV', 'production'),
-                "database_connected": db_url is not None
+                "database_connected": db_url is not None,
+                "replicas": replica_router.status()
             }, 200
 
+        @app.route('/api/health/pool')
+        def pool_health():
+            """Checkout-wait and saturation telemetry per engine."""
+            return {"profile": pool_profile, "engines": pool_stats(db.engines)}, 200
+
+        @app.route('/api/health/evaluate')
+        def evaluate_health():
+            """Admission, load-shedding and stale-serving counters for the evaluate path."""
+            return evaluation_guard.snapshot(), 200
+
     return app
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+from flask_sqlalchemy import SQLAlchemy
+from app.utils.db_routing import RoutingSession, REPLICA_BIND_PREFIX, router as replica_router
+from app.utils.db_pool import resolve_pool_profile, build_engine_options
+from app.utils.db_embedded import is_embedded, embedded_engine_options, init_embedded
+
+# The SQLAlchemy singleton and its configuration, shared by the management API and the
+# evaluation server. Kept free of admin-only dependencies (JWT, CORS, schemas, the LLM client).
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def configure_database(app, logger):
+    """
+    Database settings shared by every app factory (management API and evaluation server):
+    URL, read replica binds, pool profile or embedded SQLite mode. Initializes `db`.
+    Returns (db_url, embedded, pool_profile).
+    """
+    # Railway Public URL often starts with postgres://; SQLAlchemy 2.0 requires postgresql://
+    db_url = os.getenv('DATABASE_URL')
+    if db_url and db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+    
+    if not db_url:
+        logger.error("PRODUCTION CRITICAL: DATABASE_URL is missing!")
+    else:
+        # Log a masked version to verify the variable is being read in Vercel
+        logger.info(f"Database URI detected: {db_url[:15]}...{db_url[-5:]}")
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Optional read replicas (comma-separated). Read-only routes may be served from
+    # these; everything else stays on the primary. See app/utils/db_routing.py.
+    replica_urls = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {
+        f"{REPLICA_BIND_PREFIX}{i}": url.replace("postgres://", "postgresql://", 1)
+        for i, url in enumerate(replica_urls)
+    }
+    app.config['REPLICA_MAX_LAG'] = float(os.getenv('REPLICA_MAX_LAG', 5))
+    if replica_urls:
+        logger.info(f"Read replicas configured: {len(replica_urls)}")
+    
+    # Pool profile: 'serverless' (NullPool) or 'server' (tuned QueuePool). See app/utils/db_pool.py.
+    # A sqlite:// URL selects embedded single-node mode instead. See app/utils/db_embedded.py.
+    embedded = is_embedded(db_url)
+    pool_profile = "embedded" if embedded else resolve_pool_profile()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = embedded_engine_options(db_url) if embedded else build_engine_options(pool_profile)
+    logger.info(f"Database pool profile: {pool_profile}")
+
+    db.init_app(app)
+    if embedded:
+        init_embedded(app, db)
+    replica_router.init_app(app, db)
+    return db_url, embedded, pool_profile
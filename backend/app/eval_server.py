@@ -0,0 +1,134 @@
+import os
+import logging
+from flask import Flask, request
+from app.database import configure_database
+from app.services.evaluation import FlagSnapshot
+from app.services.telemetry_writer import telemetry_writer
+from app.utils.db_embedded import is_in_memory
+from app.utils.helpers import api_response, format_error, configure_logging
+
+# Standalone evaluation server: the SDK-facing subset of the API, deployable and
+# scalable apart from the management API. It serves flag state from an in-memory
+# FlagSnapshot (no query per evaluation) and always writes telemetry through the
+# batched telemetry writer. The LLM client, pydantic schemas and Flask-Migrate are
+# never imported, and JWT/CORS are not initialized.
+# Entry point: backend/eval_wsgi.py. Paths mirror the management API, so a load
+# balancer can route /api/flags/evaluate* and /api/flags/telemetry here.
+
+MAX_BULK_KEYS = 200
+MAX_TELEMETRY_EVENTS = 1000
+
+snapshot = FlagSnapshot()
+
+
+def _env_name(value):
+    return (value or "Production").capitalize()
+
+
+def create_eval_app():
+    app = Flask(__name__)
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    configure_logging()
+
+    db_url, embedded, _ = configure_database(app, logger)
+    if embedded and is_in_memory(db_url):
+        # The writer thread would share the single in-memory connection with requests
+        raise RuntimeError("The evaluation server needs a file or server database, not in-memory SQLite")
+    snapshot.ttl = float(os.getenv("EVAL_SNAPSHOT_TTL", snapshot.ttl))
+    telemetry_writer.init_app(app, enabled=True)
+
+    # Load the first snapshot at startup; if the database is down, requests retry it
+    with app.app_context():
+        snapshot.refresh(force=True)
+
+    @app.route("/api/flags/evaluate/<string:key>", methods=["GET"])
+    def evaluate(key):
+        """Same contract as the management API's evaluate route."""
+        env_name = _env_name(request.args.get("env"))
+        context_id = request.args.get("user") or request.headers.get("X-Context-Id")
+
+        if snapshot.loaded_at is None:
+            snapshot.refresh()
+            if snapshot.loaded_at is None:
+                return api_response(False, "Evaluation temporarily unavailable", format_error("no flag snapshot yet"), 503)
+
+        state = snapshot.get(key, env_name)
+        if state is None:
+            return api_response(False, "Flag Not Found", None, 404)
+        flag_id, env_found, is_enabled = state
+        if not env_found:
+            return api_response(False, f"Environment '{env_name}' Not Found", None, 404)
+
+        telemetry_writer.submit(flag_id, env_name, context_id)
+        data = {"enabled": is_enabled}
+        if snapshot.stale:
+            data.update(stale=True, stale_age_seconds=snapshot.status()["age_seconds"])
+        return api_response(True, f"Traffic captured for {env_name}", data, 200)
+
+    @app.route("/api/flags/evaluate", methods=["POST"])
+    def bulk_evaluate():
+        """
+        Evaluates several flags in one call.
+        Body: {"env": "production", "keys": ["a", "b"], "user": "<context id>"}
+        """
+        body = request.get_json(silent=True) or {}
+        keys = body.get("keys")
+        if not isinstance(keys, list) or not keys or len(keys) > MAX_BULK_KEYS or not all(isinstance(k, str) for k in keys):
+            return api_response(False, "Input Error", format_error(f"keys must be a list of 1-{MAX_BULK_KEYS} flag keys"), 400)
+        env_name = _env_name(body.get("env"))
+        context_id = body.get("user") or request.headers.get("X-Context-Id")
+
+        snapshot.refresh()
+        if snapshot.loaded_at is None:
+            return api_response(False, "Evaluation temporarily unavailable", format_error("no flag snapshot yet"), 503)
+        if env_name not in snapshot.environments:
+            return api_response(False, f"Environment '{env_name}' Not Found", None, 404)
+
+        flags, missing = {}, []
+        for key in dict.fromkeys(keys):
+            state = snapshot.get(key, env_name)
+            if state is None:
+                missing.append(key)
+                continue
+            flag_id, _, flags[key] = state
+            telemetry_writer.submit(flag_id, env_name, context_id)
+
+        data = {"flags": flags, "missing": missing, "stale": snapshot.stale}
+        return api_response(True, f"{len(flags)} flags evaluated for {env_name}", data, 200)
+
+    @app.route("/api/flags/telemetry", methods=["POST"])
+    def ingest_telemetry():
+        """
+        Accepts evaluations made locally by SDKs.
+        Body: {"events": [{"key": "a", "env": "production", "user": "<context id>"}, ...]}
+        """
+        events = (request.get_json(silent=True) or {}).get("events")
+        if not isinstance(events, list) or not events or len(events) > MAX_TELEMETRY_EVENTS:
+            return api_response(False, "Input Error", format_error(f"events must be a list of 1-{MAX_TELEMETRY_EVENTS} items"), 400)
+
+        snapshot.refresh()
+        accepted = rejected = 0
+        for event in events:
+            entry = snapshot.flags.get(event.get("key")) if isinstance(event, dict) else None
+            env_name = _env_name(event.get("env")) if entry else None
+            if entry is None or env_name not in snapshot.environments:
+                rejected += 1
+                continue
+            if telemetry_writer.submit(entry[0], env_name, event.get("user")):
+                accepted += 1
+            else:
+                rejected += 1
+
+        return api_response(True, "Telemetry accepted", {"accepted": accepted, "rejected": rejected}, 202)
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        return {
+            "status": "online",
+            "snapshot": snapshot.status(),
+            "telemetry": telemetry_writer.status()
+        }, 200
+
+    return app
@@ -1,8 +1,12 @@
 from app import db  # Singleton instance from __init__.py
+from sqlalchemy import DDL, JSON, event
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# JSONB on Postgres, plain JSON (TEXT) on SQLite and other dialects (embedded mode)
+JSONType = JSON().with_variant(JSONB, "postgresql")
+
 class User(db.Model):
     """
     Core Identity Management.
@@ -35,8 +39,14 @@ class User(db.Model):
 class FeatureFlag(db.Model):
     """
     The main definition of a feature toggle.
+    Catalog search uses a btree prefix index on key plus pg_trgm GIN indexes on
+    key/name (created on Postgres only, see the DDL hooks below the class).
     """
     __tablename__ = 'feature_flags'
+    __table_args__ = (
+        db.Index('ix_feature_flags_name_id', 'name', 'id'),
+        db.Index('ix_feature_flags_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -59,6 +69,18 @@ class FeatureFlag(db.Model):
             "statuses": [s.to_dict() for s in self.statuses]
         }
 
+# Sub-linear catalog search on Postgres: prefix lookups on key and trigram (ILIKE '%q%') on key/name.
+# These only run when the table is created; upgrade_db.py applies them to existing databases.
+CATALOG_SEARCH_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+CATALOG_SEARCH_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_feature_flags_key_prefix ON feature_flags (key varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_feature_flags_key_trgm ON feature_flags USING gin (key gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_feature_flags_name_trgm ON feature_flags USING gin (name gin_trgm_ops)",
+)
+event.listen(FeatureFlag.__table__, "before_create", DDL(CATALOG_SEARCH_EXTENSION).execute_if(dialect="postgresql"))
+for _search_index in CATALOG_SEARCH_INDEXES:
+    event.listen(FeatureFlag.__table__, "after_create", DDL(_search_index).execute_if(dialect="postgresql"))
+
 class Environment(db.Model):
     """
     Deployment environments (Dev, Staging, Production).
@@ -76,11 +98,17 @@ class FlagStatus(db.Model):
     Stores the state (On/Off) of a flag per environment.
     """
     __tablename__ = 'flag_statuses'
+    __table_args__ = (
+        db.Index('ix_flag_statuses_flag_env', 'flag_id', 'env_id'),
+        db.Index('ix_flag_statuses_env_enabled', 'env_id', 'is_enabled', 'flag_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     flag_id = db.Column(db.Integer, db.ForeignKey('feature_flags.id'), nullable=False)
     env_id = db.Column(db.Integer, db.ForeignKey('environments.id'), nullable=False)
     is_enabled = db.Column(db.Boolean, default=False)
+    # Optimistic concurrency token: bumped by every toggle, exposed to clients as an ETag.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     env = db.relationship('Environment', backref='flag_links')
@@ -91,6 +119,7 @@ class FlagStatus(db.Model):
             "environment_name": self.env.name if self.env else "Unknown",
             "environment_id": self.env_id,
             "is_enabled": self.is_enabled,
+            "version": self.version,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
@@ -107,20 +136,82 @@ class FlagEvaluation(db.Model):
     environment_name = db.Column(db.String(50), default="Production")
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+class FlagReachSketch(db.Model):
+    """
+    Unique-user telemetry. One HyperLogLog sketch per flag, environment and hour;
+    buckets merge on demand into distinct-user estimates for any window.
+    """
+    __tablename__ = 'flag_reach_sketches'
+    __table_args__ = (
+        db.UniqueConstraint('flag_id', 'environment_name', 'bucket_start', name='uq_flag_reach_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    flag_id = db.Column(db.Integer, db.ForeignKey('feature_flags.id', ondelete='CASCADE'), nullable=False)
+    environment_name = db.Column(db.String(50), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False, index=True) # Truncated to the hour (UTC)
+    registers = db.Column(db.LargeBinary, nullable=False) # zlib-compressed HLL registers (app/utils/hll.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AIReport(db.Model):
+    """
+    Content-addressed store of AI risk reports. Identical reports (e.g. the block
+    and the manager override that follows it) are stored once and shared by every
+    AuditLog row that cites them.
+    """
+    __tablename__ = 'ai_reports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False) # sha256 of the canonical JSON
+    risk_score = db.Column(db.Integer, index=True)
+    risk_level = db.Column(db.String(20))
+    payload = db.Column(JSONType, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AICallTrace(db.Model):
+    """
+    One row per AI auditor call (including cache hits), written in batches off the
+    request path by app.services.ai_tracing. Feeds latency percentiles and error rates.
+    """
+    __tablename__ = 'ai_call_traces'
+
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    ended_at = db.Column(db.DateTime, nullable=False)
+    latency_ms = db.Column(db.Float, nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    label = db.Column(db.String(200))
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    outcome = db.Column(db.String(20), nullable=False, index=True) # ok, timeout, parse_error, http_error, error, unconfigured
+    cache_hit = db.Column(db.Boolean, default=False, nullable=False)
+
 class AuditLog(db.Model):
     """
     Observability Ledger. Stores all human actions and AI assessments.
+    Risk score/level are promoted out of the AI report so the ledger can be
+    filtered by risk with an index scan.
     """
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        db.Index('ix_audit_logs_risk_score_timestamp', 'risk_score', 'timestamp'),
+        db.Index('ix_audit_logs_action_risk_score', 'action', 'risk_score'),
+        db.Index('ix_audit_logs_flag_id_id', 'flag_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     flag_id = db.Column(db.Integer, db.ForeignKey('feature_flags.id'))
     env_name = db.Column(db.String(50))
     action = db.Column(db.String(100)) # 'TOGGLE_ON', 'AI_BLOCK', 'AUDIT_REQUEST'
     reason = db.Column(db.Text)
-    ai_metadata = db.Column(JSONB, nullable=True) # Stores the Groq JSON response
+    ai_report_id = db.Column(db.Integer, db.ForeignKey('ai_reports.id'), nullable=True, index=True)
+    risk_score = db.Column(db.Integer, nullable=True)
+    risk_level = db.Column(db.String(20), nullable=True, index=True)
+    ai_metadata = db.Column(JSONType, nullable=True) # Legacy: inline Groq JSON on rows written before ai_reports existed
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    ai_report = db.relationship('AIReport', lazy=True)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -128,6 +219,65 @@ class AuditLog(db.Model):
             "env_name": self.env_name,
             "action": self.action,
             "reason": self.reason,
-            "ai_metadata": self.ai_metadata,
+            "risk_score": self.risk_score,
+            "risk_level": self.risk_level,
+            "ai_metadata": self.ai_report.payload if self.ai_report else self.ai_metadata,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None
-        }
\ No newline at end of file
+        }
+
+class WebhookSubscription(db.Model):
+    """
+    A downstream endpoint notified of flag changes.
+    Deliveries are batched per subscriber and capped at `max_concurrency` in-flight
+    requests across all webhook workers.
+    """
+    __tablename__ = 'webhook_subscriptions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    secret = db.Column(db.String(128), nullable=False) # HMAC-SHA256 signing key
+    max_concurrency = db.Column(db.Integer, default=2, nullable=False)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "max_concurrency": self.max_concurrency,
+            "is_active": self.is_active,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+class WebhookOutbox(db.Model):
+    """
+    Transactional outbox. One row per flag change, written in the same transaction
+    as the AuditLog row; the webhook worker fans it out to subscribers later.
+    """
+    __tablename__ = 'webhook_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False) # 'flag.toggled'
+    payload = db.Column(JSONType, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime, nullable=True, index=True) # NULL until fanned out
+
+class WebhookDelivery(db.Model):
+    """One outbox event owed to one subscriber, with its retry state."""
+    __tablename__ = 'webhook_deliveries'
+    __table_args__ = (
+        db.Index('ix_webhook_deliveries_due', 'status', 'next_attempt_at'),
+        db.Index('ix_webhook_deliveries_subscription_due', 'subscription_id', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('webhook_subscriptions.id', ondelete='CASCADE'), nullable=False)
+    outbox_id = db.Column(db.Integer, db.ForeignKey('webhook_outbox.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False) # 'pending', 'delivered', 'dead'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False) # Lease expiry while in flight
+    lease_id = db.Column(db.String(32), nullable=True) # Set while in flight; rows sharing one form one POST
+    last_error = db.Column(db.Text)
+    delivered_at = db.Column(db.DateTime)
+
+    event = db.relationship('WebhookOutbox')
@@ -4,6 +4,8 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from app.models import FeatureFlag, FlagEvaluation
 from app.services.ai_agent import AIAgent
+from app.services.ai_tracing import AITraceService
+from app.utils.db_routing import read_replica
 from app.utils.helpers import api_response, format_error
 
 # Standardizing logs for the AI lifecycle
@@ -14,6 +16,7 @@ ai_bp = Blueprint("ai", __name__)
 
 @ai_bp.route("/analyze-risk", methods=["POST"])
 @jwt_required()
+@read_replica
 def analyze_deployment_risk():
     """
     Standalone endpoint for on-demand AI risk analysis.
@@ -84,4 +87,29 @@ def analyze_deployment_risk():
             message="Graceful Degradation Active", 
             data=fail_safe_data, 
             status_code=200 
-        )
\ No newline at end of file
+        )
+
+@ai_bp.route("/traces/stats", methods=["GET"])
+@jwt_required()
+@read_replica
+def get_trace_stats():
+    """
+    Latency percentiles, error rates and token usage of AI auditor calls,
+    bucketed by hour or day. Query: ?hours=24&bucket=hour|day
+    """
+    bucket = request.args.get("bucket", "hour")
+    if bucket not in ("hour", "day"):
+        return api_response(False, "Invalid bucket", format_error("bucket must be 'hour' or 'day'"), 400)
+
+    try:
+        hours = int(request.args.get("hours", 24))
+    except ValueError:
+        return api_response(False, "Invalid hours", format_error("hours must be an integer"), 400)
+    hours = max(1, min(hours, 24 * 30))
+
+    try:
+        stats = AITraceService.get_latency_stats(hours=hours, bucket=bucket)
+        return api_response(True, "AI trace stats retrieved", {"hours": hours, "bucket": bucket, "series": stats})
+    except Exception as e:
+        logger.exception(f"Trace stats failure: {e}")
+        return api_response(False, "Error retrieving trace stats", format_error(str(e)), 500)
@@ -1,8 +1,8 @@
 import logging
 from flask import Blueprint, request, g
-from flask_jwt_extended import create_access_token, get_jwt
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt
 from pydantic import ValidationError
-from app import db, jwt
+from app import db
 from app.models import User
 from app.schemas import UserLoginSchema, UserRegisterSchema
 from app.utils.helpers import api_response, format_error, parse_pydantic_errors
@@ -13,6 +13,9 @@ logger = logging.getLogger(__name__)
 # Note: Removed url_prefix here because it's managed in the App Factory (create_app)
 auth_bp = Blueprint("auth", __name__)
 
+# Initialized by create_app; lives here with the callbacks it drives
+jwt = JWTManager()
+
 # --- BRIDGE: The "Missing Link" for RBAC ---
 
 @jwt.user_lookup_loader
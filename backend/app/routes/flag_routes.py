@@ -1,11 +1,20 @@
+import os
 import time
 import logging
-from flask import Blueprint, request, g
+from flask import Blueprint, Response, request, g, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt
-from app.services.flag_service import FlagService
-from app.schemas import FlagCreateSchema, FlagToggleSchema
-from app.utils.helpers import api_response, format_error
+from app.services.flag_service import FlagService, ToggleConflict, CATALOG_SORTS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.evaluation import EvaluationService
+from app.services.risk_heatmap import heatmap
+from app.services.dashboard import dashboard
+from app.schemas import FlagCreateSchema, FlagToggleSchema, FlagBatchToggleSchema
+from app.utils.db_routing import read_replica
+from app.utils.admission import evaluation_guard
+from app.utils.query_budget import query_budget
+from app.utils.helpers import api_response, format_error, RawJSON, encode_cursor, decode_cursor, parse_pydantic_errors, parse_iso_datetime, parse_if_match, stream_ndjson, stream_csv
 from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
 
 # Senior Move: Contextual logging for infrastructure changes
 logger = logging.getLogger(__name__)
@@ -14,20 +23,61 @@ logger = logging.getLogger(__name__)
 flags_bp = Blueprint("flags", __name__)
 
 # Minimalist Backend Cache: Protective shield against Rapid-Fire requests.
+# Entries hold pre-serialized RawJSON so cache hits skip encoding entirely.
 # NOTE: On Vercel (Serverless), this cache is instance-specific. 
 # Concurrent requests may hit different instances with empty caches.
 _cache = {
     "analytics": {"data": None, "expiry": 0},
-    "logs": {"data": None, "expiry": 0}
+    "logs": {"data": None, "expiry": 0},
+    "risk_heatmap": {"data": None, "version": None}
 }
 CACHE_TTL = 5 
 
+# Statement timeout for the evaluate state read (Postgres only)
+EVAL_DB_TIMEOUT_MS = int(os.getenv("EVAL_DB_TIMEOUT_MS", 500))
+
 @flags_bp.route("", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@read_replica
 def list_flags():
-    """Returns all feature flags with current statuses for all envs."""
-    flags = FlagService.get_all_flags()
-    return api_response(True, "Flags retrieved", [f.to_dict() for f in flags])
+    """
+    Returns one page of feature flags with current statuses for all envs.
+    Query: ?limit=<=500&cursor=<X-Next-Cursor>&sort=key|name|created_at (prefix '-' for desc)
+           &q=<search>&env=<name>&enabled=true|false
+    The next page is advertised via the X-Next-Cursor and Link headers.
+    """
+    sort = request.args.get("sort", "key")
+    if sort.lstrip("-") not in CATALOG_SORTS:
+        return api_response(False, "Input Error", format_error(f"sort must be one of {sorted(CATALOG_SORTS)}"), 400)
+
+    enabled = request.args.get("enabled")
+    if enabled is not None and enabled.lower() not in ("true", "false"):
+        return api_response(False, "Input Error", format_error("enabled must be 'true' or 'false'"), 400)
+    if enabled is not None and not request.args.get("env"):
+        return api_response(False, "Input Error", format_error("enabled requires env"), 400)
+
+    try:
+        limit = max(1, min(int(request.args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        flags, next_cursor = FlagService.get_flags_page(
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            search=(request.args.get("q") or "").strip() or None,
+            env_name=request.args.get("env", "").capitalize() or None,
+            enabled=None if enabled is None else enabled.lower() == "true"
+        )
+    except ValueError:
+        return api_response(False, "Input Error", format_error("limit must be an integer and cursor must come from X-Next-Cursor"), 400)
+
+    response, status_code = api_response(True, "Flags retrieved", [f.to_dict() for f in flags])
+    if next_cursor:
+        token = encode_cursor(next_cursor)
+        response.headers["X-Next-Cursor"] = token
+        params = {**request.args.to_dict(), "cursor": token}
+        response.headers["Link"] = f'<{url_for("flags.list_flags", _external=True, **params)}>; rel="next"'
+    return response, status_code
 
 @flags_bp.route("", methods=["POST"])
 @jwt_required()
@@ -42,6 +92,8 @@ def create_flag():
         json_data = request.get_json()
         data = FlagCreateSchema(**json_data)
         new_flag = FlagService.create_new_flag(data)
+        heatmap.invalidate()
+        dashboard.invalidate()
         return api_response(True, "Feature defined successfully", new_flag.to_dict(), 201)
     except ValidationError as e:
         return api_response(False, "Schema Violation", {"errors": e.errors()}, 400)
@@ -71,70 +123,180 @@ def audit_flag(flag_id: int):
 # --- STAGE 2: DEPLOY (TOGGLE) ---
 
 @flags_bp.route("/<int:flag_id>/toggle", methods=["PATCH"])
+@query_budget(14)
 @jwt_required()
 def toggle_flag(flag_id: int):
-    """Stage 2: Executes the toggle. Enforces AI blocks unless Manager overrides."""
+    """
+    Stage 2: Executes the toggle. Enforces AI blocks unless Manager overrides.
+    Optimistic locking: send the last seen version via If-Match (or expected_version);
+    a stale version yields 409 with the current one.
+    """
     try:
         # Inject role into global context for the Service Layer to see
         g.user_role = get_jwt().get("role", "developer")
         
         json_data = request.get_json()
         data = FlagToggleSchema(**json_data)
+
+        if request.headers.get("If-Match"):
+            try:
+                data.expected_version = parse_if_match(request.headers["If-Match"])
+            except ValueError:
+                return api_response(False, "Input Error", format_error("If-Match must carry a numeric version"), 400)
+
         result, error_data = FlagService.toggle_status(flag_id, data)
         
         if error_data:
             return api_response(False, "AI Guardrail Blocked Action", error_data, 403)
-            
-        return api_response(True, "State updated safely", result.to_dict(), 200)
+
+        heatmap.invalidate()
+        dashboard.invalidate()
+        response, status_code = api_response(True, "State updated safely", result, 200)
+        response.headers["ETag"] = f'"{result["version"]}"'
+        return response, status_code
+    except ToggleConflict as e:
+        return api_response(False, "Version Conflict", format_error(
+            "Flag state changed since it was last read", {"current_version": e.current_version}
+        ), 409)
     except Exception as e:
         logger.exception(f"Toggle failure for flag {flag_id}")
         return api_response(False, "System Error", format_error("Deployment failure"), 500)
 
+def _release_size():
+    """Targets in a release-train body (the schema caps them at 100)."""
+    targets = (request.get_json(silent=True) or {}).get("targets")
+    return min(len(targets), 100) if isinstance(targets, list) else 0
+
+@flags_bp.route("/toggle-batch", methods=["POST"])
+@query_budget(10, per_item=3, items=_release_size)
+@jwt_required()
+def toggle_release_train():
+    """
+    Release Train: toggles several flag/environment pairs atomically with one
+    combined AI assessment. Returns per-flag results, or 409 naming the stale target.
+    """
+    try:
+        g.user_role = get_jwt().get("role", "developer")
+
+        data = FlagBatchToggleSchema(**request.get_json())
+        result, error_data = FlagService.toggle_batch(data)
+
+        if error_data:
+            return api_response(False, "AI Guardrail Blocked Action", error_data, 403)
+
+        heatmap.invalidate()
+        dashboard.invalidate()
+        return api_response(True, f"Release train applied ({len(result['results'])} changes)", result, 200)
+    except ValidationError as e:
+        return api_response(False, "Schema Violation", parse_pydantic_errors(e), 400)
+    except ToggleConflict as e:
+        return api_response(False, "Version Conflict", format_error(
+            "Flag state changed since it was last read",
+            {"flag_id": e.flag_id, "environment_id": e.environment_id, "current_version": e.current_version}
+        ), 409)
+    except Exception as e:
+        logger.exception("Release train failure")
+        return api_response(False, "System Error", format_error("Deployment failure"), 500)
+
 # --- PUBLIC TELEMETRY & SDK (ENVIRONMENT AWARE) ---
 
 @flags_bp.route("/evaluate/<string:key>", methods=["GET"])
+@query_budget(3)
 def track_traffic(key: str):
     """
     SDK Simulation: Logs a hit and returns state for specific environment.
+    Pass ?user=<id> (or X-Context-Id) to count the caller toward unique-user reach.
+    Under overload or a slow/failing database, telemetry is shed first and then the
+    last known state is served from memory with "stale": true (see EvaluationGuard).
     """
-    from app.models import FeatureFlag, FlagStatus, Environment
-    
     env_name = request.args.get('env', 'Production').capitalize()
-    
-    # 1. Capture the 'hit' for AI Blast Radius analytics
-    FlagService.track_evaluation(key, env_name)
-    
-    # 2. Resolve Database Objects
-    flag = FeatureFlag.query.filter_by(key=key).first()
-    if not flag: 
-        return api_response(False, "Flag Not Found", None, 404)
-    
-    target_env = Environment.query.filter_by(name=env_name).first()
-    if not target_env:
-        return api_response(False, f"Environment '{env_name}' Not Found", None, 404)
-    
-    # 3. Return the state for the specific Environment
-    status = FlagStatus.query.filter_by(flag_id=flag.id, env_id=target_env.id).first()
-    
-    return api_response(True, f"Traffic captured for {env_name}", {"enabled": status.is_enabled}, 200)
+    context_id = request.args.get('user') or request.headers.get('X-Context-Id')
+
+    with evaluation_guard.admit() as admitted:
+        if not admitted:
+            return _serve_last_known(key, env_name, "overloaded")
+
+        # 1. Resolve the state for the specific Environment (single query)
+        started = time.perf_counter()
+        try:
+            state = EvaluationService.get_state(key, env_name, timeout_ms=EVAL_DB_TIMEOUT_MS)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            evaluation_guard.observe_error(e)
+            return _serve_last_known(key, env_name, "database unavailable")
+        evaluation_guard.observe_read(time.perf_counter() - started)
+
+        if state is None:
+            return api_response(False, "Flag Not Found", None, 404)
+        flag_id, env_found, is_enabled = state
+        if not env_found:
+            return api_response(False, f"Environment '{env_name}' Not Found", None, 404)
+        evaluation_guard.remember(key, env_name, is_enabled)
+
+        # 2. Capture the 'hit' for AI Blast Radius analytics (first thing shed under load)
+        with evaluation_guard.telemetry() as allowed:
+            if allowed:
+                try:
+                    EvaluationService.record(flag_id, env_name, context_id)
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    evaluation_guard.observe_error(e)
+
+    return api_response(True, f"Traffic captured for {env_name}", {"enabled": is_enabled}, 200)
+
+def _serve_last_known(key, env_name, reason):
+    known = evaluation_guard.last_known(key, env_name)
+    if known is None:
+        return api_response(False, "Evaluation temporarily unavailable", format_error(reason), 503)
+    is_enabled, age = known
+    return api_response(
+        True,
+        f"Serving last known state for {env_name} ({reason})",
+        {"enabled": is_enabled, "stale": True, "stale_age_seconds": round(age, 1)},
+        200
+    )
 
 # --- CACHED ANALYTICS & LOGS ---
 
+@flags_bp.route("/summary", methods=["GET"])
+@query_budget(8)
+@jwt_required()
+@read_replica
+def get_dashboard_summary():
+    """
+    One-call dashboard refresh: every flag's per-environment state, 24h hits per
+    environment, latest ledger entry and last risk score, plus the recent ledger
+    (replaces polling /flags, /analytics and /logs). Served from a versioned, pre-serialized document;
+    send the ETag back as If-None-Match to get a 304 while nothing changed.
+    """
+    document = dashboard.get()  # read once: body and version always belong together
+    etag = f'"{document.version}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = Response(status=304)
+    else:
+        response, _ = api_response(True, "Dashboard summary retrieved", document.body, 200)
+    response.headers["ETag"] = etag
+    return response
+
 @flags_bp.route("/analytics", methods=["GET"])
+@query_budget(3)
 @jwt_required()
+@read_replica
 def get_traffic_analytics():
     """Aggregated traffic stats. Uses 5s Cache for performance."""
     now = time.time()
     if _cache["analytics"]["data"] and now < _cache["analytics"]["expiry"]:
         return api_response(True, "Analytics retrieved (cached)", _cache["analytics"]["data"], 200)
 
-    stats = FlagService.get_traffic_stats()
+    stats = RawJSON.of(FlagService.get_traffic_stats())
     _cache["analytics"]["data"] = stats
     _cache["analytics"]["expiry"] = now + CACHE_TTL
     return api_response(True, "Analytics retrieved", stats, 200)
 
 @flags_bp.route("/logs", methods=["GET"])
+@query_budget(2)
 @jwt_required()
+@read_replica
 def get_audit_trail():
     """System Ledger for live activity feed. Uses 5s Cache."""
     now = time.time()
@@ -142,7 +304,98 @@ def get_audit_trail():
         return api_response(True, "Audit trail retrieved (cached)", _cache["logs"]["data"], 200)
 
     logs = FlagService.get_audit_history()
-    log_dicts = [l.to_dict() for l in logs]
+    log_dicts = RawJSON.of([l.to_dict() for l in logs])
     _cache["logs"]["data"] = log_dicts
     _cache["logs"]["expiry"] = now + CACHE_TTL
-    return api_response(True, "Audit trail retrieved", log_dicts, 200)
\ No newline at end of file
+    return api_response(True, "Audit trail retrieved", log_dicts, 200)
+
+@flags_bp.route("/logs/risk", methods=["GET"])
+@query_budget(2)
+@jwt_required()
+@read_replica
+def get_risk_events():
+    """
+    Risk-filtered ledger, e.g. all blocks scoring 8+ this week:
+    ?min_score=8&action=AI_BLOCK&since=<iso>&limit=100
+    """
+    try:
+        min_score = int(request.args.get("min_score", 8))
+        limit = min(int(request.args.get("limit", 100)), 500)
+        since = parse_iso_datetime(request.args.get("since"))
+    except ValueError:
+        return api_response(False, "Input Error", format_error("min_score/limit must be integers, since ISO-8601"), 400)
+
+    logs = FlagService.get_risk_events(min_score, since, request.args.get("action"), limit)
+    return api_response(True, "Risk events retrieved", [l.to_dict() for l in logs], 200)
+
+@flags_bp.route("/risk-heatmap", methods=["GET"])
+@query_budget(8)
+@jwt_required()
+@read_replica
+def get_risk_heatmap():
+    """
+    Deterministic risk score for every flag x environment (no LLM calls).
+    Query: ?min_score=1-10 keeps only flags at or above that score somewhere.
+    The full document is pre-serialized once per heatmap version.
+    """
+    try:
+        min_score = int(request.args["min_score"]) if "min_score" in request.args else None
+    except ValueError:
+        return api_response(False, "Input Error", format_error("min_score must be an integer"), 400)
+
+    state = heatmap.get()
+    if min_score is not None:
+        return api_response(True, "Risk heatmap retrieved", RawJSON.of(state.to_document(min_score)), 200)
+
+    # Read and replace the entry whole, so data and version always belong together
+    cached = _cache["risk_heatmap"]
+    if cached["version"] != state.version:
+        cached = {"data": RawJSON.of(state.to_document()), "version": state.version}
+        _cache["risk_heatmap"] = cached
+    return api_response(True, "Risk heatmap retrieved", cached["data"], 200)
+
+# --- STREAMING EXPORTS (COMPLIANCE / DATA SCIENCE) ---
+
+EXPORT_FIELDS = {
+    "evaluations": ["id", "flag_key", "environment_name", "timestamp"],
+    "logs": ["id", "flag_key", "env_name", "action", "reason", "risk_score", "risk_level", "ai_metadata", "timestamp"]
+}
+
+@flags_bp.route("/export/<string:dataset>", methods=["GET"])
+@jwt_required()
+@read_replica
+def export_dataset(dataset: str):
+    """
+    Streams raw evaluations or audit logs as NDJSON (default) or CSV.
+    Filters: ?since=<iso>&until=<iso>&flag_key=<key>&format=ndjson|csv
+    """
+    if dataset not in EXPORT_FIELDS:
+        return api_response(False, "Unknown Dataset", format_error("Use 'evaluations' or 'logs'"), 404)
+
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in ("ndjson", "csv"):
+        return api_response(False, "Input Error", format_error("format must be 'ndjson' or 'csv'"), 400)
+
+    try:
+        since = parse_iso_datetime(request.args.get("since"))
+        until = parse_iso_datetime(request.args.get("until"))
+    except ValueError:
+        return api_response(False, "Input Error", format_error("since/until must be ISO-8601 timestamps"), 400)
+
+    flag_key = request.args.get("flag_key")
+    stream = FlagService.stream_evaluations if dataset == "evaluations" else FlagService.stream_audit_logs
+    rows = stream(since=since, until=until, flag_key=flag_key)
+
+    logger.info(f"Export started: {dataset} as {export_format} by {get_jwt().get('sub')}")
+
+    if export_format == "csv":
+        body, mimetype = stream_csv(rows, EXPORT_FIELDS[dataset]), "text/csv"
+    else:
+        body, mimetype = stream_ndjson(rows), "application/x-ndjson"
+
+    filename = f"safeconfig_{dataset}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
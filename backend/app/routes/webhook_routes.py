@@ -0,0 +1,48 @@
+import logging
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, get_jwt
+from pydantic import ValidationError
+from app.schemas import WebhookSubscriptionSchema
+from app.services.webhook_service import WebhookService
+from app.utils.helpers import api_response, format_error, parse_pydantic_errors
+
+logger = logging.getLogger(__name__)
+
+# Note: url_prefix is managed in the App Factory (create_app)
+webhooks_bp = Blueprint("webhooks", __name__)
+
+def _is_manager():
+    return get_jwt().get("role") == "manager"
+
+@webhooks_bp.route("", methods=["GET"])
+@jwt_required()
+def list_subscriptions():
+    """Active webhook receivers for flag-change events."""
+    subscriptions = WebhookService.list_subscriptions()
+    return api_response(True, "Subscriptions retrieved", [s.to_dict() for s in subscriptions], 200)
+
+@webhooks_bp.route("", methods=["POST"])
+@jwt_required()
+def create_subscription():
+    """RBAC: Only Managers can register receivers. The signing secret is returned once."""
+    if not _is_manager():
+        return api_response(False, "Forbidden", format_error("Managerial privileges required"), 403)
+
+    try:
+        data = WebhookSubscriptionSchema(**(request.get_json() or {}))
+        subscription, secret = WebhookService.create_subscription(data)
+        logger.info(f"Webhook subscription {subscription.id} registered for {subscription.url}")
+        return api_response(True, "Subscription created", {**subscription.to_dict(), "secret": secret}, 201)
+    except ValidationError as e:
+        return api_response(False, "Schema Violation", parse_pydantic_errors(e), 400)
+
+@webhooks_bp.route("/<int:subscription_id>", methods=["DELETE"])
+@jwt_required()
+def delete_subscription(subscription_id: int):
+    """Deactivates a receiver; its pending deliveries are dropped by the worker."""
+    if not _is_manager():
+        return api_response(False, "Forbidden", format_error("Managerial privileges required"), 403)
+
+    if not WebhookService.deactivate_subscription(subscription_id):
+        return api_response(False, "Not Found", format_error("Unknown subscription"), 404)
+    return api_response(True, "Subscription deactivated", None, 200)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator, ConfigDict, EmailStr
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_validator, ConfigDict, EmailStr, AnyHttpUrl
+from typing import Optional, Literal, List
 
 # --- AUTH SCHEMAS ---
 
@@ -58,6 +58,48 @@ class FlagToggleSchema(BaseModel):
     # Requiring a reason is a "Senior" move—it forces developers to document intent.
     reason: str = Field(..., min_length=5)
 
+    # Optimistic locking: the FlagStatus version the client last saw (also accepted via If-Match).
+    expected_version: Optional[int] = Field(None, ge=1)
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+class FlagToggleTargetSchema(BaseModel):
+    """One flag/environment pair inside a release-train toggle."""
+    flag_id: int
+    environment_id: int
+    expected_version: Optional[int] = Field(None, ge=1)
+
+class FlagBatchToggleSchema(BaseModel):
+    """
+    Validation for a release-train toggle: several flags flipped atomically
+    under one reason and one combined AI assessment.
+    """
+    targets: List[FlagToggleTargetSchema] = Field(..., min_length=1, max_length=100)
+    reason: str = Field(..., min_length=5)
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    @field_validator('targets')
+    @classmethod
+    def targets_must_be_unique(cls, v: List[FlagToggleTargetSchema]) -> List[FlagToggleTargetSchema]:
+        """A pair toggled twice in one release would silently cancel itself out."""
+        pairs = {(t.flag_id, t.environment_id) for t in v}
+        if len(pairs) != len(v):
+            raise ValueError("Each flag/environment pair may appear only once")
+        return v
+
+
+# --- WEBHOOK SCHEMAS ---
+
+class WebhookSubscriptionSchema(BaseModel):
+    """
+    Validation for registering a webhook receiver.
+    If no secret is supplied one is generated and returned once.
+    """
+    url: AnyHttpUrl
+    secret: Optional[str] = Field(None, min_length=16, max_length=128)
+    max_concurrency: int = Field(2, ge=1, le=16)
+
     model_config = ConfigDict(str_strip_whitespace=True)
 
 
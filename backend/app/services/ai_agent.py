@@ -1,12 +1,22 @@
 # Groq third-party SDK for AI generation API
 import os
 import json
+import time
+import hashlib
 import logging
-from groq import Groq
-from typing import Dict, Any
+import threading
+from datetime import datetime, timedelta
+from groq import Groq, APITimeoutError, APIStatusError, APIConnectionError
+from typing import Dict, Any, List, Optional
+from app.services.ai_tracing import trace_recorder
 
 logger = logging.getLogger(__name__)
 
+MODEL = "openai/gpt-oss-120b"
+REPORT_CACHE_TTL = float(os.getenv("AI_REPORT_CACHE_TTL", 60)) # seconds; identical prompts reuse the report
+_report_cache = {}  # prompt digest -> (report, cached_at)
+_report_cache_lock = threading.Lock()
+
 class AIAgent:
     @staticmethod
     def _get_client():
@@ -19,16 +29,12 @@ class AIAgent:
         return Groq(api_key=api_key, timeout=10.0)
 
     @classmethod
-    def get_risk_report(cls, feature_name: str, environment: str, description: str, traffic_count: int = 0) -> Dict[str, Any]:
+    def get_risk_report(cls, feature_name: str, environment: str, description: str, traffic_count: int = 0, unique_users: Optional[int] = None) -> Dict[str, Any]:
    
         client = cls._get_client()
         
         if not client:
-            return {
-                "risk_score": 5,
-                "advice": "System Warning: Groq Client not initialized. Check API Key.",
-                "risk_level": "medium"
-            }
+            return cls._unconfigured(label=feature_name)
 
         prompt = f"""
         System: Act as a Senior DevOps and Infrastructure Safety Engineer.
@@ -38,11 +44,12 @@ class AIAgent:
         - Feature: {feature_name}
         - Environment: {environment}
         - Current Live Traffic (Hits in last 24h): {traffic_count}
+        - Estimated Unique Users (last 24h): {unique_users if unique_users is not None else "unknown"}
         - Description: {description}
 
         Internal Policy (Safety Weights):
         1. SENSITIVITY: If 'payment', 'database', or 'auth' in Production, base risk is HIGH.
-        2. BLAST RADIUS: If Traffic > 1000, increase risk_score by +2.
+        2. BLAST RADIUS: If Traffic > 1000 or Unique Users > 500, increase risk_score by +2. Prefer Unique Users when known: many hits from few users is one chatty client, not a wide blast radius.
         3. MITIGATION: If description mentions 'circuit breaker', 'alpha testing', or 'internal', REDUCE risk_score by 3-4 points.
         4. ZERO TRAFFIC RULE: If traffic is 0 and mitigations exist, risk_score should NOT exceed 7.
 
@@ -56,24 +63,133 @@ class AIAgent:
         }}
         """
 
+        return cls._complete(client, prompt, label=feature_name)
+
+    @classmethod
+    def get_batch_risk_report(cls, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        One combined assessment for a release train of flag changes.
+        Each change carries feature_name, environment, description and traffic_count.
+        """
+        client = cls._get_client()
+
+        if not client:
+            return cls._unconfigured(label=f"release of {len(changes)} flags")
+
+        change_lines = "\n".join(
+            f"        - {c['feature_name']} ({c['environment']}, Hits in last 24h: {c['traffic_count']}, "
+            f"Est. Unique Users: {c.get('unique_users', 'unknown')}): {c['description']}"
+            for c in changes
+        )
+
+        prompt = f"""
+        System: Act as a Senior DevOps and Infrastructure Safety Engineer.
+        Task: Analyze the combined technical risk of toggling these feature flags together in one release.
+
+        Changes:
+{change_lines}
+
+        Internal Policy (Safety Weights):
+        1. SENSITIVITY: If 'payment', 'database', or 'auth' in Production, base risk is HIGH.
+        2. BLAST RADIUS: If combined Traffic > 1000 or combined Unique Users > 500, increase risk_score by +2.
+        3. MITIGATION: If descriptions mention 'circuit breaker', 'alpha testing', or 'internal', REDUCE risk_score by 3-4 points.
+        4. COUPLING: Flipping several high-traffic flags at once compounds risk; score the release as a whole.
+
+        Constraint: Return ONLY a raw JSON object. No conversational filler.
+        
+        Structure:
+        {{
+          "risk_score": <int 1-10>,
+          "advice": "<detailed technical explanation>",
+          "risk_level": "low" | "medium" | "high"
+        }}
+        """
+
+        return cls._complete(client, prompt, label=f"release of {len(changes)} flags")
+
+    @staticmethod
+    def _complete(client, prompt: str, label: str) -> Dict[str, Any]:
+        """
+        Sends a risk prompt to Groq and parses the JSON report, falling back to a safe default.
+        Successful reports are reused for REPORT_CACHE_TTL seconds. Every call, cached or not,
+        is traced (latency, tokens, outcome) to the AI call ledger.
+        """
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        cached = _report_cache.get(digest)
+        if cached and time.monotonic() - cached[1] < REPORT_CACHE_TTL:
+            AIAgent._trace(started_at, started, label, "ok", cache_hit=True)
+            return dict(cached[0])
+
+        usage = None
         try:
             chat_completion = client.chat.completions.create(
                 messages=[{"role": "user", "content": prompt}],
-                model="openai/gpt-oss-120b",
+                model=MODEL,
                 temperature=0.1,
                 response_format={"type": "json_object"}
             )
+            usage = chat_completion.usage
             
             response_text = chat_completion.choices[0].message.content
             report = json.loads(response_text)
             
-            logger.info(f"Groq Audit: {feature_name} -> Score: {report.get('risk_score')}")
-            return report
+            logger.info(f"Groq Audit: {label} -> Score: {report.get('risk_score')}")
+            AIAgent._trace(started_at, started, label, "ok", usage=usage)
+            AIAgent._cache_report(digest, report)
+            return dict(report)
 
         except Exception as e:
             logger.error(f"Groq AI Request Failed: {str(e)}")
+            AIAgent._trace(started_at, started, label, AIAgent._classify_failure(e), usage=usage)
             return {
                 "risk_score": 5, 
                 "advice": f"AI Auditor offline (Timeout/Error). Safety default applied.", 
                 "risk_level": "medium"
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def _unconfigured(label: str) -> Dict[str, Any]:
+        """Safe default when no Groq client is configured, traced as its own outcome so stats still count the call."""
+        AIAgent._trace(datetime.utcnow(), time.perf_counter(), label, "unconfigured")
+        return {
+            "risk_score": 5,
+            "advice": "System Warning: Groq Client not initialized. Check API Key.",
+            "risk_level": "medium"
+        }
+
+    @staticmethod
+    def _classify_failure(error: Exception) -> str:
+        if isinstance(error, APITimeoutError):
+            return "timeout"
+        if isinstance(error, (APIStatusError, APIConnectionError)):
+            return "http_error"
+        if isinstance(error, (ValueError, KeyError, IndexError, TypeError, AttributeError)):
+            return "parse_error" # json.JSONDecodeError is a ValueError
+        return "error"
+
+    @staticmethod
+    def _cache_report(digest: str, report: Dict[str, Any]):
+        now = time.monotonic()
+        with _report_cache_lock:
+            if len(_report_cache) > 1000:
+                for key in [k for k, (_, at) in _report_cache.items() if now - at >= REPORT_CACHE_TTL]:
+                    del _report_cache[key]
+            _report_cache[digest] = (report, now)
+
+    @staticmethod
+    def _trace(started_at, started, label, outcome, usage=None, cache_hit=False):
+        latency_ms = (time.perf_counter() - started) * 1000
+        trace_recorder.record({
+            "started_at": started_at,
+            "ended_at": started_at + timedelta(milliseconds=latency_ms),
+            "latency_ms": round(latency_ms, 3),
+            "model": MODEL,
+            "label": label[:200],
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "outcome": outcome,
+            "cache_hit": cache_hit
+        })
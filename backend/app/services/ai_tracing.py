@@ -0,0 +1,181 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, case
+
+logger = logging.getLogger(__name__)
+
+TRACE_OUTCOMES = ("ok", "timeout", "parse_error", "http_error", "error", "unconfigured")  # unconfigured: no API key, default report
+
+
+class AITraceRecorder:
+    """
+    Buffers AI call traces in memory and writes them in batches from a background
+    thread, so recording a trace never adds a DB round trip to the audit path.
+    Flushes every `interval` seconds or as soon as `batch_size` traces are waiting.
+    """
+
+    def __init__(self, batch_size=100, interval=2.0, max_buffer=10000):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self.enabled = True
+        self._app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def init_app(self, app, enabled=True):
+        """`enabled=False` drops traces (in-memory SQLite: its one connection is not thread-safe)."""
+        self.enabled = enabled
+        self._app = app
+        atexit.register(self.flush)
+
+    def record(self, trace):
+        """Queues one trace dict (columns of AICallTrace). Never blocks on I/O."""
+        if self._app is None or not self.enabled:
+            return
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(trace)
+            pending = len(self._buffer)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ai-trace-writer", daemon=True)
+                self._thread.start()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch or self._app is None:
+            return
+
+        from app.models import db, AICallTrace
+        with self._app.app_context():
+            try:
+                db.session.execute(insert(AICallTrace), batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Dropped {len(batch)} AI traces: {e}")
+
+
+trace_recorder = AITraceRecorder()
+
+
+class AITraceService:
+    """Read side of the AI call ledger: latency percentiles and error rates over time."""
+
+    @staticmethod
+    def get_latency_stats(hours=24, bucket="hour"):
+        """
+        Per-bucket call counts, latency percentiles (p50/p95/p99, excluding cache hits),
+        outcome rates and token totals for the last `hours`.
+        """
+        from app.models import db, AICallTrace
+
+        since = datetime.utcnow() - timedelta(hours=hours)
+        if db.session.get_bind().dialect.name == "postgresql":
+            return AITraceService._stats_sql(db, AICallTrace, since, bucket)
+        return AITraceService._stats_python(db, AICallTrace, since, bucket)
+
+    @staticmethod
+    def _stats_sql(db, AICallTrace, since, bucket):
+        period = func.date_trunc(bucket, AICallTrace.started_at).label("period")
+        live = AICallTrace.cache_hit.is_(False)
+
+        def pct(q):
+            return func.percentile_cont(q).within_group(AICallTrace.latency_ms).filter(live)
+
+        def rate(outcome):
+            return func.avg(case((AICallTrace.outcome == outcome, 1.0), else_=0.0))
+
+        rows = db.session.query(
+            period,
+            func.count(AICallTrace.id),
+            pct(0.5), pct(0.95), pct(0.99),
+            rate("timeout"), rate("parse_error"), rate("http_error"), rate("unconfigured"),
+            func.avg(case((AICallTrace.outcome != "ok", 1.0), else_=0.0)),
+            func.avg(case((AICallTrace.cache_hit.is_(True), 1.0), else_=0.0)),
+            func.coalesce(func.sum(AICallTrace.prompt_tokens), 0),
+            func.coalesce(func.sum(AICallTrace.completion_tokens), 0)
+        ).filter(AICallTrace.started_at >= since).group_by(period).order_by(period).all()
+
+        return [
+            {
+                "period": r[0].isoformat(),
+                "calls": r[1],
+                "p50_ms": _round(r[2]), "p95_ms": _round(r[3]), "p99_ms": _round(r[4]),
+                "timeout_rate": _round(r[5], 4), "parse_error_rate": _round(r[6], 4),
+                "http_error_rate": _round(r[7], 4), "unconfigured_rate": _round(r[8], 4),
+                "error_rate": _round(r[9], 4), "cache_hit_rate": _round(r[10], 4),
+                "prompt_tokens": int(r[11]), "completion_tokens": int(r[12])
+            }
+            for r in rows
+        ]
+
+    @staticmethod
+    def _stats_python(db, AICallTrace, since, bucket):
+        """Portable fallback for dialects without percentile_cont (e.g. SQLite)."""
+        rows = db.session.query(
+            AICallTrace.started_at, AICallTrace.latency_ms, AICallTrace.outcome,
+            AICallTrace.cache_hit, AICallTrace.prompt_tokens, AICallTrace.completion_tokens
+        ).filter(AICallTrace.started_at >= since).all()
+
+        truncate = {
+            "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+            "day": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0)
+        }[bucket]
+
+        groups = defaultdict(list)
+        for row in rows:
+            groups[truncate(row.started_at)].append(row)
+
+        stats = []
+        for period in sorted(groups):
+            calls = groups[period]
+            latencies = sorted(r.latency_ms for r in calls if not r.cache_hit)
+            outcomes = [r.outcome for r in calls]
+            stats.append({
+                "period": period.isoformat(),
+                "calls": len(calls),
+                "p50_ms": _percentile(latencies, 0.5),
+                "p95_ms": _percentile(latencies, 0.95),
+                "p99_ms": _percentile(latencies, 0.99),
+                "timeout_rate": _round(outcomes.count("timeout") / len(calls), 4),
+                "parse_error_rate": _round(outcomes.count("parse_error") / len(calls), 4),
+                "http_error_rate": _round(outcomes.count("http_error") / len(calls), 4),
+                "unconfigured_rate": _round(outcomes.count("unconfigured") / len(calls), 4),
+                "error_rate": _round(sum(o != "ok" for o in outcomes) / len(calls), 4),
+                "cache_hit_rate": _round(sum(bool(r.cache_hit) for r in calls) / len(calls), 4),
+                "prompt_tokens": sum(r.prompt_tokens or 0 for r in calls),
+                "completion_tokens": sum(r.completion_tokens or 0 for r in calls)
+            })
+        return stats
+
+
+def _round(value, digits=1):
+    return round(float(value), digits) if value is not None else None
+
+
+def _percentile(sorted_values, q):
+    """Linear-interpolated percentile, matching Postgres percentile_cont."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return _round(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower))
@@ -0,0 +1,196 @@
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func, case, select, or_
+from app.models import db, FeatureFlag, Environment, FlagStatus, FlagEvaluation, AuditLog
+from app.services.flag_service import FlagService
+from app.utils.helpers import RawJSON
+from app.utils.db_routing import on_primary
+
+logger = logging.getLogger(__name__)
+
+WINDOW_HOURS = 24
+
+
+class SummaryDocument:
+    """One published summary: the serialized body and its ETag, replaced as a whole."""
+    __slots__ = ("body", "version")
+
+    def __init__(self, body, version):
+        self.body = body          # RawJSON
+        self.version = version    # digest of `body`, served as the ETag
+
+
+class DashboardSummary:
+    """
+    Everything the dashboard and analytics pages show, as one pre-serialized document:
+    per flag, its state in every environment, 24h hits per environment, the latest
+    ledger entry and the last risk-scored ledger entry, plus the recent ledger feed.
+
+    The catalog part is keyed on a single-row fingerprint (flag, environment and status
+    counts, sum of status versions, newest ledger id), checked at most every `ttl`
+    seconds and rebuilt only when it moved. Evaluations are not in the fingerprint:
+    the 24h hit counters are re-queried on their own, slower `traffic_ttl` cadence.
+    The ETag is the digest of the body, so clients get a 304 until the content
+    itself changes.
+    """
+
+    def __init__(self, ttl=5.0, traffic_ttl=30.0):
+        self.ttl = ttl
+        self.traffic_ttl = traffic_ttl
+        self.document = None       # SummaryDocument, None until the first build
+        self.fingerprint = None
+        self._catalog = None       # everything but the hit counters
+        self._traffic = {}         # (flag_id, environment name) -> 24h hits
+        self._checked_at = 0.0
+        self._traffic_at = 0.0
+        self._lock = threading.Lock()
+
+    def _due(self):
+        return time.monotonic() - self._checked_at >= self.ttl
+
+    def get(self):
+        """
+        The current SummaryDocument. When a check is due one caller runs it; everyone
+        else keeps reading the last published document (only the very first build waits).
+        """
+        if self._due() and self._lock.acquire(blocking=self.document is None):
+            try:
+                if self._due():
+                    with on_primary():  # shared by every client: never built from a lagging replica
+                        self._refresh()
+            finally:
+                self._lock.release()
+        return self.document
+
+    def invalidate(self):
+        """Makes the next get() rebuild the catalog part (e.g. right after a toggle)."""
+        self.fingerprint = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        checked_at = time.monotonic()
+        fingerprint = tuple(db.session.query(
+            db.session.query(func.count(FeatureFlag.id)).scalar_subquery(),
+            db.session.query(func.count(Environment.id)).scalar_subquery(),
+            db.session.query(func.count(FlagStatus.id)).scalar_subquery(),
+            db.session.query(func.coalesce(func.sum(FlagStatus.version), 0)).scalar_subquery(),
+            db.session.query(func.max(AuditLog.id)).scalar_subquery()
+        ).one())
+        self._checked_at = checked_at
+        catalog_moved = fingerprint != self.fingerprint
+        traffic_due = checked_at - self._traffic_at >= self.traffic_ttl
+        if not (catalog_moved or traffic_due):
+            return
+
+        started = time.perf_counter()
+        if catalog_moved:
+            self._catalog = self._build()
+            self.fingerprint = fingerprint
+        if traffic_due:
+            self._traffic = self._load_traffic()
+            self._traffic_at = checked_at
+        self._publish()
+        logger.debug(
+            f"Dashboard summary refreshed (catalog={catalog_moved}, traffic={traffic_due}): "
+            f"{len(self._catalog['flags'])} flags in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    def _publish(self):
+        environments = self._catalog["environments"]
+        flags = [
+            {**flag, "hits_24h": {name: self._traffic.get((flag["id"], name), 0) for name in environments}}
+            for flag in self._catalog["flags"]
+        ]
+        body = RawJSON.of({**self._catalog, "flags": flags})
+        version = hashlib.sha256(body.body).hexdigest()[:16]
+        if self.document is None or version != self.document.version:
+            self.document = SummaryDocument(body, version)
+
+    def _load_traffic(self):
+        # 24h hits per environment (served by the timestamp index)
+        since = datetime.utcnow() - timedelta(hours=WINDOW_HOURS)
+        return {
+            (flag_id, env_name): hits
+            for flag_id, env_name, hits in db.session.query(
+                FlagEvaluation.flag_id, FlagEvaluation.environment_name, func.count(FlagEvaluation.id)
+            ).filter(FlagEvaluation.timestamp >= since).group_by(FlagEvaluation.flag_id, FlagEvaluation.environment_name)
+        }
+
+    def _build(self):
+        environments = db.session.query(Environment.id, Environment.name).order_by(Environment.id).all()
+        env_names = [name for _, name in environments]
+
+        flags = {}
+        for flag_id, key, name, description, created_at in db.session.query(
+            FeatureFlag.id, FeatureFlag.key, FeatureFlag.name, FeatureFlag.description, FeatureFlag.created_at
+        ).order_by(FeatureFlag.key):
+            flags[flag_id] = {
+                "id": flag_id,
+                "key": key,
+                "name": name,
+                "description": description,
+                "created_at": created_at,
+                "statuses": {},
+                "hits_24h": None,  # filled from the traffic counters on publish
+                "latest_audit": None,
+                "last_risk": None
+            }
+
+        # State per environment
+        for flag_id, env_id, env_name, is_enabled, version, updated_at in db.session.query(
+            FlagStatus.flag_id, FlagStatus.env_id, Environment.name, FlagStatus.is_enabled, FlagStatus.version, FlagStatus.updated_at
+        ).join(Environment, Environment.id == FlagStatus.env_id):
+            if flag_id in flags:
+                flags[flag_id]["statuses"][env_name] = {
+                    "environment_id": env_id,
+                    "is_enabled": bool(is_enabled),
+                    "version": version,
+                    "updated_at": updated_at
+                }
+
+        # Latest ledger entry and latest risk-scored entry per flag, in one statement.
+        # Ledger ids grow with time, so max(id) per flag (ix_audit_logs_flag_id_id) is the newest row.
+        latest = select(
+            func.max(AuditLog.id).label("entry_id"),
+            func.max(case((AuditLog.risk_score.isnot(None), AuditLog.id))).label("risk_id")
+        ).where(AuditLog.flag_id.isnot(None)).group_by(AuditLog.flag_id).subquery()
+        rows = db.session.query(
+            AuditLog.id, AuditLog.flag_id, AuditLog.env_name, AuditLog.action, AuditLog.reason,
+            AuditLog.risk_score, AuditLog.risk_level, AuditLog.timestamp
+        ).filter(or_(AuditLog.id.in_(select(latest.c.entry_id)), AuditLog.id.in_(select(latest.c.risk_id)))).order_by(AuditLog.id)
+
+        for entry_id, flag_id, env_name, action, reason, risk_score, risk_level, timestamp in rows:
+            flag = flags.get(flag_id)
+            if flag is None:
+                continue
+            # Rows arrive oldest first, so the last one seen per flag is its newest entry
+            flag["latest_audit"] = {
+                "id": entry_id,
+                "env_name": env_name,
+                "action": action,
+                "reason": reason,
+                "risk_score": risk_score,
+                "risk_level": risk_level,
+                "timestamp": timestamp
+            }
+            if risk_score is not None:
+                flag["last_risk"] = {"score": risk_score, "level": risk_level, "env_name": env_name, "action": action, "timestamp": timestamp}
+
+        # Recent ledger feed (same rows as /flags/logs), so the pages need no second poll
+        ledger = []
+        for entry in FlagService.get_audit_history():
+            flag = flags.get(entry.flag_id)
+            ledger.append({**entry.to_dict(), "flag_key": flag["key"] if flag else None})
+
+        return {
+            "window_hours": WINDOW_HOURS,
+            "environments": env_names,
+            "flags": list(flags.values()),
+            "ledger": ledger
+        }
+
+
+dashboard = DashboardSummary()
@@ -0,0 +1,225 @@
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.models import db, FeatureFlag, Environment, FlagStatus, FlagEvaluation, FlagReachSketch
+from app.services.telemetry_writer import telemetry_writer
+from app.utils import hll
+
+logger = logging.getLogger(__name__)
+
+# SDK-facing evaluation logic, shared by the management API (app/routes/flag_routes.py)
+# and the standalone evaluation server (app/eval_server.py). Keep this module free of
+# admin-only dependencies (JWT, pydantic schemas, the LLM client) so evaluation
+# workers do not pay for them.
+
+
+class EvaluationService:
+    """Flag state reads and evaluation telemetry."""
+
+    @staticmethod
+    def get_state(key, env_name, timeout_ms=None):
+        """
+        Resolves a flag's state in one environment with a single query.
+        Returns None if the flag does not exist, else (flag_id, environment found, is_enabled).
+        On Postgres, `timeout_ms` caps the statement so a slow database fails fast.
+        """
+        if timeout_ms and db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+        row = db.session.query(FeatureFlag.id, Environment.id, FlagStatus.is_enabled).select_from(FeatureFlag).outerjoin(
+            Environment, Environment.name == env_name
+        ).outerjoin(
+            FlagStatus, (FlagStatus.flag_id == FeatureFlag.id) & (FlagStatus.env_id == Environment.id)
+        ).filter(FeatureFlag.key == key).first()
+
+        if row is None:
+            return None
+        return row[0], row[1] is not None, bool(row[2])
+
+    @staticmethod
+    def record(flag_id, env_name, context_id=None):
+        """Records one evaluation of a known flag, through the telemetry writer when it is enabled."""
+        if telemetry_writer.enabled:
+            return telemetry_writer.submit(flag_id, env_name, context_id)
+
+        # Log the hit linked to the Flag ID and the specific Environment Name
+        db.session.add(FlagEvaluation(flag_id=flag_id, environment_name=env_name))
+        db.session.commit()
+        if context_id:
+            reach_buffer.add(flag_id, env_name, context_id)
+        return True
+
+    @staticmethod
+    def merge_reaches(sketches):
+        """
+        Folds pre-built sketches, keyed by (flag_id, environment_name, bucket_start),
+        into their stored buckets. Each bucket row is locked once per call. Does not commit.
+        """
+        for (flag_id, env_name, bucket), registers in sketches.items():
+            bucket_filter = dict(flag_id=flag_id, environment_name=env_name, bucket_start=bucket)
+            sketch = FlagReachSketch.query.filter_by(**bucket_filter).with_for_update().first()
+            if sketch is None:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(FlagReachSketch(registers=hll.encode(registers), **bucket_filter))
+                    continue
+                except IntegrityError:
+                    sketch = FlagReachSketch.query.filter_by(**bucket_filter).with_for_update().populate_existing().first()
+            sketch.registers = hll.encode(hll.merge(hll.decode(sketch.registers), registers))
+
+
+class ReachBuffer:
+    """
+    Unique-user reach for the inline telemetry path (the queued TelemetryWriter batches
+    its own). Context ids are folded into in-process HyperLogLog sketches per
+    (flag, environment, hour) and merged into FlagReachSketch every `interval` seconds
+    by a background thread, so concurrent evaluations of a popular flag never queue on
+    its bucket row lock: each process locks a bucket once per flush.
+    """
+
+    def __init__(self, interval=1.0, max_buckets=10000):
+        self.interval = interval
+        self.max_buckets = max_buckets
+        self.dropped = 0
+        self.background = True
+        self._app = None
+        self._sketches = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app, background=True):
+        """`background=False` merges from the caller's thread on every add (single-connection in-memory SQLite)."""
+        self._app = app
+        self.background = background
+        atexit.register(self.flush)
+
+    def add(self, flag_id, env_name, context_id, at=None):
+        bucket = (at or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+        key = (flag_id, env_name, bucket)
+        with self._lock:
+            if key not in self._sketches:
+                if len(self._sketches) >= self.max_buckets:
+                    self.dropped += 1
+                    return
+                self._sketches[key] = hll.empty_sketch()
+            hll.add(self._sketches[key], context_id)
+            if self.background and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="reach-writer", daemon=True)
+                self._thread.start()
+        if not self.background:
+            self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            sketches, self._sketches = self._sketches, {}
+        if not sketches or self._app is None:
+            return
+
+        with self._write_lock, self._app.app_context():
+            try:
+                # Work done for many requests, so never charged to the one that triggered
+                # it (inline flushes run inside an evaluate request's query budget)
+                db.session.connection(execution_options={"budget_exempt": True})
+                EvaluationService.merge_reaches(sketches)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._restore(sketches)
+                logger.error(f"Reach merge failed; {len(sketches)} buckets kept for the next flush: {e}")
+
+    def _restore(self, sketches):
+        """Folds sketches whose write failed back into the buffer."""
+        with self._lock:
+            for key, registers in sketches.items():
+                if key in self._sketches:
+                    self._sketches[key] = hll.merge(self._sketches[key], registers)
+                elif len(self._sketches) < self.max_buckets:
+                    self._sketches[key] = registers
+                else:
+                    self.dropped += 1
+
+
+reach_buffer = ReachBuffer()
+
+
+class FlagSnapshot:
+    """
+    In-memory copy of every flag's state in every environment, so evaluations are
+    answered without a query. At most every `ttl` seconds one request checks a cheap
+    fingerprint (flag count, status count, sum of status versions — every toggle bumps
+    a version) and reloads only if it moved. If the database is unreachable the last
+    snapshot keeps being served and reports itself stale.
+    """
+
+    def __init__(self, ttl=1.0):
+        self.ttl = ttl
+        self.flags = {}          # flag key -> (flag_id, {environment name: is_enabled})
+        self.environments = frozenset()
+        self.fingerprint = None
+        self.loaded_at = None    # wall clock of the last successful check
+        self.stale = False
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def get(self, key, env_name):
+        """None if the flag is unknown, else (flag_id, environment found, is_enabled)."""
+        self.refresh()
+        entry = self.flags.get(key)
+        if entry is None:
+            return None
+        flag_id, states = entry
+        return flag_id, env_name in self.environments, states.get(env_name, False)
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self._checked_at < self.ttl:
+            return
+        # One refresher at a time; everyone else keeps reading the current snapshot
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            fingerprint = db.session.query(
+                db.session.query(func.count(FeatureFlag.id)).scalar_subquery(),
+                func.count(FlagStatus.id),
+                func.coalesce(func.sum(FlagStatus.version), 0)
+            ).one()
+            if force or tuple(fingerprint) != self.fingerprint:
+                self._load(tuple(fingerprint))
+            self.loaded_at = time.time()
+            self.stale = False
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if not self.stale:
+                logger.warning(f"Flag snapshot refresh failed; serving last snapshot: {e}")
+            self.stale = True
+        finally:
+            self._refresh_lock.release()
+
+    def _load(self, fingerprint):
+        flags = {key: (flag_id, {}) for flag_id, key in db.session.query(FeatureFlag.id, FeatureFlag.key)}
+        environments = frozenset(name for (name,) in db.session.query(Environment.name))
+        rows = db.session.query(FeatureFlag.key, Environment.name, FlagStatus.is_enabled).join(
+            FlagStatus, FlagStatus.flag_id == FeatureFlag.id
+        ).join(Environment, Environment.id == FlagStatus.env_id)
+        for key, env_name, is_enabled in rows:
+            flags[key][1][env_name] = bool(is_enabled)
+
+        self.flags, self.environments, self.fingerprint = flags, environments, fingerprint
+
+    def status(self):
+        return {
+            "flags": len(self.flags),
+            "environments": sorted(self.environments),
+            "stale": self.stale,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None
+        }
@@ -1,13 +1,36 @@
+import json
+import hashlib
 import logging
 from flask import g
 from datetime import datetime, timedelta, timezone
-from app.models import db, FeatureFlag, Environment, FlagStatus, AuditLog, FlagEvaluation
+from app.models import db, FeatureFlag, Environment, FlagStatus, AuditLog, FlagEvaluation, FlagReachSketch, AIReport
 from app.services.ai_agent import AIAgent
-from sqlalchemy import func
-from sqlalchemy.exc import SQLAlchemyError
+from app.services.webhook_service import WebhookService
+from sqlalchemy import func, select, update, insert, literal, case, not_, false, tuple_, or_, exists
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from app.utils import hll
 
 logger = logging.getLogger(__name__)
 
+# Catalog paging bounds: every listing response is at most MAX_PAGE_SIZE flags.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+CATALOG_SORTS = {"key": FeatureFlag.key, "name": FeatureFlag.name, "created_at": FeatureFlag.created_at}
+
+# Rows per keyset window in exports. Each window is read on its own short-lived
+# connection that is released before the rows are sent, so a slow download never pins one.
+EXPORT_CHUNK_SIZE = 5000
+
+class ToggleConflict(Exception):
+    """Raised when a toggle's expected version no longer matches the stored FlagStatus."""
+
+    def __init__(self, current_version, flag_id=None, environment_id=None):
+        super().__init__(f"FlagStatus has moved on to version {current_version}")
+        self.current_version = current_version
+        self.flag_id = flag_id
+        self.environment_id = environment_id
+
 class FlagService:
     """
     The Business Logic Layer.
@@ -15,9 +38,60 @@ class FlagService:
     """
 
     @staticmethod
-    def get_all_flags():
-        """Fetches all flags with their status across all environments."""
-        return FeatureFlag.query.all()
+    def get_flags_page(limit=DEFAULT_PAGE_SIZE, cursor=None, sort="key", search=None, env_name=None, enabled=None):
+        """
+        One keyset-paginated page of the flag catalog, so query cost and response
+        size stay bounded however large the catalog grows.
+        - sort: key | name | created_at, prefix '-' for descending
+        - search: key prefix for short terms; key/name substring (trigram-indexed) from 3 chars
+        - env_name + enabled: only flags whose state in that environment matches
+        `cursor` is the decoded [sort_value, id] of the previous page's last row.
+        Returns (flags, next_cursor_values or None).
+        """
+        descending = sort.startswith("-")
+        column = CATALOG_SORTS[sort.lstrip("-")]
+        query = FeatureFlag.query.options(selectinload(FeatureFlag.statuses).joinedload(FlagStatus.env))
+
+        if search:
+            if len(search) < 3:
+                query = query.filter(FeatureFlag.key.startswith(search, autoescape=True))
+            else:
+                query = query.filter(or_(
+                    FeatureFlag.key.icontains(search, autoescape=True),
+                    FeatureFlag.name.icontains(search, autoescape=True)
+                ))
+
+        if env_name and enabled is not None:
+            query = query.filter(exists().where(
+                FlagStatus.flag_id == FeatureFlag.id,
+                FlagStatus.env_id == Environment.id,
+                Environment.name == env_name,
+                FlagStatus.is_enabled == enabled
+            ))
+
+        if cursor:
+            last_value, last_id = cursor
+            # Cursors come back from clients: anything this sort could not have produced is rejected
+            if type(last_id) is not int or not (isinstance(last_value, str) or (last_value is None and column.nullable)):
+                raise ValueError("Cursor does not match the sort order")
+            if column is FeatureFlag.created_at and last_value is not None:
+                last_value = datetime.fromisoformat(last_value)
+            position = tuple_(column, FeatureFlag.id)
+            boundary = tuple_(literal(last_value, column.type), literal(last_id))
+            query = query.filter(position < boundary if descending else position > boundary)
+
+        if descending:
+            query = query.order_by(column.desc(), FeatureFlag.id.desc())
+        else:
+            query = query.order_by(column.asc(), FeatureFlag.id.asc())
+
+        flags = query.limit(limit + 1).all()
+        if len(flags) <= limit:
+            return flags, None
+
+        flags = flags[:limit]
+        last = flags[-1]
+        return flags, [getattr(last, column.key), last.id]
 
     @staticmethod
     def create_new_flag(data):
@@ -59,6 +133,55 @@ class FlagService:
             FlagEvaluation.timestamp >= one_day_ago
         ).scalar() or 0
 
+    @staticmethod
+    def _get_blast_radii(pairs):
+        """Batch variant of _get_blast_radius: {(flag_id, env_name): hits} for many pairs in one grouped query."""
+        if not pairs:
+            return {}
+        one_day_ago = datetime.now(timezone.utc) - timedelta(hours=24)
+
+        rows = db.session.query(
+            FlagEvaluation.flag_id,
+            FlagEvaluation.environment_name,
+            func.count(FlagEvaluation.id)
+        ).filter(
+            tuple_(FlagEvaluation.flag_id, FlagEvaluation.environment_name).in_(list(pairs)),
+            FlagEvaluation.timestamp >= one_day_ago
+        ).group_by(FlagEvaluation.flag_id, FlagEvaluation.environment_name).all()
+
+        counts = {pair: 0 for pair in pairs}
+        counts.update({(flag_id, env_name): hits for flag_id, env_name, hits in rows})
+        return counts
+
+    @staticmethod
+    def _get_unique_reaches(pairs, hours=24):
+        """
+        Distinct-user estimates {(flag_id, env_name): users} over the last `hours`,
+        merged on demand from the hourly HyperLogLog buckets (constant memory per pair).
+        """
+        if not pairs:
+            return {}
+        since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+
+        rows = db.session.query(
+            FlagReachSketch.flag_id,
+            FlagReachSketch.environment_name,
+            FlagReachSketch.registers
+        ).filter(
+            tuple_(FlagReachSketch.flag_id, FlagReachSketch.environment_name).in_(list(pairs)),
+            FlagReachSketch.bucket_start >= since
+        ).all()
+
+        merged = {pair: hll.empty_sketch() for pair in pairs}
+        for flag_id, env_name, registers in rows:
+            merged[(flag_id, env_name)] = hll.merge(merged[(flag_id, env_name)], hll.decode(registers))
+        return {pair: hll.estimate(sketch) for pair, sketch in merged.items()}
+
+    @staticmethod
+    def _get_unique_reach(flag_id, env_name="Production"):
+        """Estimated distinct users that evaluated a flag in the last 24 hours for a specific env."""
+        return FlagService._get_unique_reaches({(flag_id, env_name)})[(flag_id, env_name)]
+
     @staticmethod
     def audit_flag(flag_id, environment_id, reason):
         """Stage 1: AI Risk Assessment using Real-Time Traffic Data."""
@@ -70,17 +193,20 @@ class FlagService:
 
         # Fetch Live Telemetry (Real Traffic) for the target environment
         traffic_count = FlagService._get_blast_radius(flag_id, env.name)
+        unique_users = FlagService._get_unique_reach(flag_id, env.name)
 
         # Call Groq AI Agent with Traffic Context
         ai_report = AIAgent.get_risk_report(
             feature_name=flag.name,
             environment=env.name,
             description=flag.description or "N/A",
-            traffic_count=traffic_count
+            traffic_count=traffic_count,
+            unique_users=unique_users
         )
 
         # Metadata for frontend HUD
         ai_report["live_traffic_hits"] = traffic_count
+        ai_report["unique_users_estimate"] = unique_users
 
         return ai_report, None
 
@@ -101,7 +227,8 @@ class FlagService:
                 feature_name=flag.name,
                 environment=env.name,
                 description=flag.description or "N/A",
-                traffic_count=traffic_count
+                traffic_count=traffic_count,
+                unique_users=FlagService._get_unique_reach(flag_id, env.name)
             )
             
             # THE HARD BLOCK & OVERRIDE LOGIC
@@ -113,7 +240,7 @@ class FlagService:
                     env_name=env.name,
                     action="AI_BLOCK",
                     reason=f"[SECURITY BLOCK] {data.reason}",
-                    ai_metadata=ai_report
+                    **FlagService._ai_ledger_fields(ai_report)
                 )
                 db.session.add(blocked_log)
                 db.session.commit()
@@ -121,56 +248,317 @@ class FlagService:
 
         # Update Phase
         try:
-            status = FlagStatus.query.filter_by(flag_id=flag_id, env_id=data.environment_id).first()
-            status.is_enabled = not status.is_enabled
-            new_state = "ON" if status.is_enabled else "OFF"
-            
             # Log successful deployment (or manager override)
-            log_action = f"TOGGLE_{new_state}"
+            action_prefix = "TOGGLE_"
             if ai_report and ai_report.get('risk_score', 0) >= 8:
-                log_action = f"MANAGER_OVERRIDE_{new_state}"
-
-            success_log = AuditLog(
-                flag_id=flag_id,
-                env_name=env.name,
-                action=log_action,
-                reason=data.reason,
-                ai_metadata=ai_report 
+                action_prefix = "MANAGER_OVERRIDE_"
+
+            status = FlagService._apply_toggle(
+                flag_id, env, data.reason, FlagService._ai_ledger_fields(ai_report), action_prefix, data.expected_version
             )
-            
-            db.session.add(success_log)
+            if status is None:
+                db.session.rollback()
+                return None, "No status row exists for this Flag/Environment pair."
+
+            # Outbox row for webhook subscribers, committed atomically with the AuditLog row
+            action = action_prefix + ("ON" if status["is_enabled"] else "OFF")
+            WebhookService.enqueue_flag_change(flag, env, status, action, data.reason)
+
             db.session.commit()
             return status, None
+        except ToggleConflict:
+            db.session.rollback()
+            raise
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Toggle transaction failed: {e}")
             return None, "Database transaction failed."
 
-    # --- TRAFFIC HUD LOGIC (ENVIRONMENT AWARE) ---
+    @staticmethod
+    def _ai_ledger_fields(ai_report):
+        """
+        Stores an AI report once (content-addressed by sha256 of its canonical JSON)
+        and returns the AuditLog columns that reference it: ai_report_id plus the
+        promoted, indexed risk_score / risk_level.
+        """
+        if ai_report is None:
+            return {"ai_report_id": None, "risk_score": None, "risk_level": None}
+
+        canonical = json.dumps(ai_report, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        try:
+            risk_score = int(ai_report.get("risk_score"))
+        except (TypeError, ValueError):
+            risk_score = None
+        risk_level = str(ai_report.get("risk_level") or "")[:20] or None
+
+        report_id = db.session.execute(select(AIReport.id).where(AIReport.digest == digest)).scalar()
+        if report_id is None:
+            try:
+                with db.session.begin_nested():
+                    stored = AIReport(digest=digest, risk_score=risk_score, risk_level=risk_level, payload=ai_report)
+                    db.session.add(stored)
+                report_id = stored.id
+            except IntegrityError:
+                # A concurrent writer stored the same report first
+                report_id = db.session.execute(select(AIReport.id).where(AIReport.digest == digest)).scalar()
+
+        return {"ai_report_id": report_id, "risk_score": risk_score, "risk_level": risk_level}
 
     @staticmethod
-    def track_evaluation(key, env_name="Production"):
-        """Captures a real traffic event linked to a specific environment."""
-        flag = FeatureFlag.query.filter_by(key=key).first()
-        if not flag: return False
-        
-        # Log the hit linked to the Flag ID and the specific Environment Name
-        hit = FlagEvaluation(flag_id=flag.id, environment_name=env_name)
-        db.session.add(hit)
-        db.session.commit()
-        return True
+    def _apply_toggle(flag_id, env, reason, ai_fields=None, action_prefix="TOGGLE_", expected_version=None):
+        """
+        Flips a FlagStatus with one conditional UPDATE ... RETURNING (no read-modify-write,
+        so concurrent toggles cannot lose an update) and stages its AuditLog row in the
+        same transaction. `ai_fields` comes from _ai_ledger_fields. On Postgres both writes travel as a single CTE statement.
+        Does not commit. Returns the new status payload, None if the row does not exist,
+        or raises ToggleConflict when `expected_version` is stale.
+        """
+        now = datetime.utcnow()
+        ai_fields = ai_fields or FlagService._ai_ledger_fields(None)
+        conditions = [FlagStatus.flag_id == flag_id, FlagStatus.env_id == env.id]
+        if expected_version is not None:
+            conditions.append(FlagStatus.version == expected_version)
+
+        flip = update(FlagStatus).where(*conditions).values(
+            is_enabled=not_(func.coalesce(FlagStatus.is_enabled, false())),
+            version=FlagStatus.version + 1,
+            updated_at=now
+        ).returning(FlagStatus.id, FlagStatus.is_enabled, FlagStatus.version, FlagStatus.updated_at)
+
+        if db.session.get_bind().dialect.name == "postgresql":
+            flipped = flip.cte("flipped")
+            ledger = insert(AuditLog).from_select(
+                ["flag_id", "env_name", "action", "reason", "ai_report_id", "risk_score", "risk_level", "timestamp"],
+                select(
+                    literal(flag_id),
+                    literal(env.name),
+                    literal(action_prefix) + case((flipped.c.is_enabled, "ON"), else_="OFF"),
+                    literal(reason),
+                    literal(ai_fields["ai_report_id"], AuditLog.ai_report_id.type),
+                    literal(ai_fields["risk_score"], AuditLog.risk_score.type),
+                    literal(ai_fields["risk_level"], AuditLog.risk_level.type),
+                    literal(now)
+                ).select_from(flipped)
+            ).cte("ledger")
+            row = db.session.execute(select(flipped).add_cte(ledger)).first()
+        else:
+            row = db.session.execute(flip, execution_options={"synchronize_session": False}).first()
+            if row is not None:
+                db.session.add(AuditLog(
+                    flag_id=flag_id,
+                    env_name=env.name,
+                    action=action_prefix + ("ON" if row.is_enabled else "OFF"),
+                    reason=reason,
+                    timestamp=now,
+                    **ai_fields
+                ))
+
+        if row is None:
+            current_version = db.session.execute(
+                select(FlagStatus.version).where(FlagStatus.flag_id == flag_id, FlagStatus.env_id == env.id)
+            ).scalar()
+            if current_version is not None:
+                raise ToggleConflict(current_version)
+            return None
+
+        return {
+            "id": row.id,
+            "environment_name": env.name,
+            "environment_id": env.id,
+            "is_enabled": row.is_enabled,
+            "version": row.version,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None
+        }
+
+    @staticmethod
+    def toggle_batch(data):
+        """
+        Release Train: flips several flag/environment pairs in one transaction.
+        Blast radius comes from one grouped query and Production targets share a single
+        AI assessment, so the whole release costs about as much as one toggle.
+        Either every change (and its AuditLog row) lands, or none does.
+        """
+        flag_ids = {t.flag_id for t in data.targets}
+        env_ids = {t.environment_id for t in data.targets}
+        flags = {f.id: f for f in FeatureFlag.query.filter(FeatureFlag.id.in_(flag_ids)).all()}
+        envs = {e.id: e for e in Environment.query.filter(Environment.id.in_(env_ids)).all()}
+
+        missing = [t for t in data.targets if t.flag_id not in flags or t.environment_id not in envs]
+        if missing:
+            return None, f"Invalid Flag or Environment target: flag {missing[0].flag_id} / env {missing[0].environment_id}."
+
+        # 🛡️ Production Guardrail (one assessment for the whole release)
+        prod_targets = [t for t in data.targets if envs[t.environment_id].name.lower() == "production"]
+        ai_report = None
+        if prod_targets:
+            prod_pairs = {(t.flag_id, envs[t.environment_id].name) for t in prod_targets}
+            radii = FlagService._get_blast_radii(prod_pairs)
+            reaches = FlagService._get_unique_reaches(prod_pairs)
+            ai_report = AIAgent.get_batch_risk_report([
+                {
+                    "feature_name": flags[t.flag_id].name,
+                    "environment": envs[t.environment_id].name,
+                    "description": flags[t.flag_id].description or "N/A",
+                    "traffic_count": radii[(t.flag_id, envs[t.environment_id].name)],
+                    "unique_users": reaches[(t.flag_id, envs[t.environment_id].name)]
+                }
+                for t in prod_targets
+            ])
+
+            user_role = getattr(g, 'user_role', 'developer')
+            if ai_report.get('risk_score', 0) >= 8 and user_role != 'manager':
+                ai_fields = FlagService._ai_ledger_fields(ai_report)
+                db.session.add_all([
+                    AuditLog(
+                        flag_id=t.flag_id,
+                        env_name=envs[t.environment_id].name,
+                        action="AI_BLOCK",
+                        reason=f"[SECURITY BLOCK] {data.reason}",
+                        **ai_fields
+                    )
+                    for t in prod_targets
+                ])
+                db.session.commit()
+                return None, {"message": ai_report['advice'], "report": ai_report}
+
+        override = bool(ai_report and ai_report.get('risk_score', 0) >= 8)
+        prod_keys = {(t.flag_id, t.environment_id) for t in prod_targets}
+
+        try:
+            prod_ai_fields = FlagService._ai_ledger_fields(ai_report)
+            results = []
+            for t in data.targets:
+                is_prod = (t.flag_id, t.environment_id) in prod_keys
+                try:
+                    status = FlagService._apply_toggle(
+                        t.flag_id,
+                        envs[t.environment_id],
+                        data.reason,
+                        prod_ai_fields if is_prod else None,
+                        "MANAGER_OVERRIDE_" if is_prod and override else "TOGGLE_",
+                        t.expected_version
+                    )
+                except ToggleConflict as e:
+                    raise ToggleConflict(e.current_version, t.flag_id, t.environment_id) from e
+
+                if status is None:
+                    db.session.rollback()
+                    return None, f"No status row exists for flag {t.flag_id} / env {t.environment_id}."
+
+                action = ("MANAGER_OVERRIDE_" if is_prod and override else "TOGGLE_") + ("ON" if status["is_enabled"] else "OFF")
+                WebhookService.enqueue_flag_change(flags[t.flag_id], envs[t.environment_id], status, action, data.reason)
+                results.append({"flag_id": t.flag_id, "flag_key": flags[t.flag_id].key, **status})
+
+            db.session.commit()
+            return {"results": results, "risk_report": ai_report}, None
+        except ToggleConflict:
+            db.session.rollback()
+            raise
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Release train transaction failed: {e}")
+            return None, "Database transaction failed."
+
+    # --- TRAFFIC HUD LOGIC (ENVIRONMENT AWARE) ---
 
     @staticmethod
     def get_traffic_stats():
-        """Aggregates hits per flag for the HUD Analytics."""
+        """Aggregates hits (all time) and unique users (last 24h) per flag for the HUD Analytics."""
         stats = db.session.query(
             FeatureFlag.key, 
             func.count(FlagEvaluation.id).label('hit_count')
         ).join(FlagEvaluation, FeatureFlag.id == FlagEvaluation.flag_id).group_by(FeatureFlag.key).all()
-        
-        return [{"key": s.key, "hits": s.hit_count} for s in stats]
+
+        since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+        sketches = db.session.query(FeatureFlag.key, FlagReachSketch.registers).join(
+            FlagReachSketch, FeatureFlag.id == FlagReachSketch.flag_id
+        ).filter(FlagReachSketch.bucket_start >= since).all()
+
+        reach = {}
+        for key, registers in sketches:
+            reach[key] = hll.merge(reach.get(key, hll.empty_sketch()), hll.decode(registers))
+
+        return [
+            {"key": s.key, "hits": s.hit_count, "unique_users": hll.estimate(reach[s.key]) if s.key in reach else 0}
+            for s in stats
+        ]
 
     @staticmethod
     def get_audit_history():
         """Returns the activity stream for the Safety Ledger."""
-        return AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(30).all()
\ No newline at end of file
+        return AuditLog.query.options(joinedload(AuditLog.ai_report)).order_by(AuditLog.timestamp.desc()).limit(30).all()
+
+    @staticmethod
+    def get_risk_events(min_score=8, since=None, action=None, limit=100):
+        """
+        Ledger rows at or above a risk score, newest first. Served by the promoted
+        risk_score / action indexes instead of scanning report JSON.
+        """
+        query = AuditLog.query.options(joinedload(AuditLog.ai_report)).filter(AuditLog.risk_score >= min_score)
+        if since: query = query.filter(AuditLog.timestamp >= since)
+        if action: query = query.filter(AuditLog.action == action)
+        return query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+
+    # --- COMPLIANCE EXPORTS (STREAMING) ---
+
+    @staticmethod
+    def _stream_keyset(stmt, id_column, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Walks a query in id order using keyset windows of `chunk_size` rows.
+        Each window is read in full on a fresh connection, which goes back to the pool
+        before any of its rows are yielded: a slow client never holds a pooled
+        connection, and memory stays bounded by one window.
+        Inside @read_replica routes the windows are read from a replica.
+        """
+        engine = db.session.get_bind(clause=stmt)
+        last_id = 0
+        while True:
+            window = stmt.where(id_column > last_id).order_by(id_column).limit(chunk_size)
+            with engine.connect() as conn:
+                rows = conn.execute(window).mappings().all()
+            if rows:
+                last_id = rows[-1]["id"]
+            for row in rows:
+                yield dict(row)
+            if len(rows) < chunk_size:
+                return
+
+    @staticmethod
+    def stream_evaluations(since=None, until=None, flag_key=None):
+        """Yields raw FlagEvaluation telemetry rows matching the export filters."""
+        stmt = select(
+            FlagEvaluation.id,
+            FeatureFlag.key.label("flag_key"),
+            FlagEvaluation.environment_name,
+            FlagEvaluation.timestamp
+        ).join(FeatureFlag, FeatureFlag.id == FlagEvaluation.flag_id)
+
+        if since: stmt = stmt.where(FlagEvaluation.timestamp >= since)
+        if until: stmt = stmt.where(FlagEvaluation.timestamp < until)
+        if flag_key: stmt = stmt.where(FeatureFlag.key == flag_key)
+
+        return FlagService._stream_keyset(stmt, FlagEvaluation.id)
+
+    @staticmethod
+    def stream_audit_logs(since=None, until=None, flag_key=None):
+        """Yields the full AuditLog ledger (including AI metadata) matching the export filters."""
+        stmt = select(
+            AuditLog.id,
+            FeatureFlag.key.label("flag_key"),
+            AuditLog.env_name,
+            AuditLog.action,
+            AuditLog.reason,
+            AuditLog.risk_score,
+            AuditLog.risk_level,
+            func.coalesce(AIReport.payload, AuditLog.ai_metadata).label("ai_metadata"),
+            AuditLog.timestamp
+        ).outerjoin(FeatureFlag, FeatureFlag.id == AuditLog.flag_id).outerjoin(
+            AIReport, AIReport.id == AuditLog.ai_report_id
+        )
+
+        if since: stmt = stmt.where(AuditLog.timestamp >= since)
+        if until: stmt = stmt.where(AuditLog.timestamp < until)
+        if flag_key: stmt = stmt.where(FeatureFlag.key == flag_key)
+
+        return FlagService._stream_keyset(stmt, AuditLog.id)
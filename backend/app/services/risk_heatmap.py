@@ -0,0 +1,255 @@
+import re
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from app.models import db, FeatureFlag, Environment, FlagStatus, FlagEvaluation
+from app.utils.db_routing import on_primary
+
+logger = logging.getLogger(__name__)
+
+# Deterministic mirror of the AI auditor's safety policy (see AIAgent.get_risk_report),
+# scored for every flag x environment at once. Scores are 1-10 like the AI's.
+SENSITIVE_TERMS = ("payment", "database", "auth")
+MITIGATION_TERMS = ("circuit breaker", "alpha testing", "internal")
+SENSITIVITY_WEIGHTS = {"Production": 5.0, "Staging": 2.0}  # other environments: 1.0
+BASE_SCORE = 2.0
+BLAST_RADIUS_HITS = 1000      # 24h hits above which the blast radius adds +2
+MITIGATION_CREDIT = 3.5
+ZERO_TRAFFIC_CAP = 7.0        # mitigated flags with no traffic never exceed this
+WINDOW_HOURS = 24
+
+_sensitive = re.compile("|".join(re.escape(t) for t in SENSITIVE_TERMS), re.IGNORECASE)
+_mitigation = re.compile("|".join(re.escape(t) for t in MITIGATION_TERMS), re.IGNORECASE)
+
+
+def score_matrix(sensitive, mitigated, hits, enabled, env_weights):
+    """
+    Vectorized risk scores.
+    sensitive, mitigated: (F,) bool; hits: (F, E) 24h evaluations; enabled: (F, E) bool;
+    env_weights: (E,) sensitivity multiplier. Returns an (F, E) int8 matrix in 1..10.
+    """
+    hits = hits.astype(np.float64)
+    score = BASE_SCORE + sensitive[:, None] * env_weights[None, :]
+    score += np.where(hits > BLAST_RADIUS_HITS, 2.0, 0.0) + np.minimum(np.log10(hits + 1) * 0.5, 1.5)
+    score += enabled   # live exposure
+    score -= mitigated[:, None] * MITIGATION_CREDIT
+    score = np.where((hits == 0) & mitigated[:, None], np.minimum(score, ZERO_TRAFFIC_CAP), score)
+    return np.clip(np.rint(score), 1, 10).astype(np.int8)
+
+
+_LEVELS = np.array(["low"] * 4 + ["medium"] * 3 + ["high"] * 4)  # indexed by score 0..10
+
+
+def risk_levels(scores):
+    """(F, E) scores -> (F, E) array of 'low' | 'medium' | 'high'."""
+    return _LEVELS[scores]
+
+
+class HeatmapState:
+    """
+    One published heatmap version. Never modified after construction: readers keep a
+    reference while the next version is built, then the refresher swaps it in.
+    """
+    __slots__ = ("version", "generated_at", "environments", "flag_ids", "keys", "names", "enabled", "hits", "scores")
+
+    def __init__(self, version, generated_at, environments, flag_ids, keys, names, enabled, hits, scores):
+        for array in (flag_ids, enabled, hits, scores):
+            array.flags.writeable = False
+        self.version = version
+        self.generated_at = generated_at
+        self.environments = tuple(environments)
+        self.flag_ids = flag_ids
+        self.keys = tuple(keys)
+        self.names = tuple(names)
+        self.enabled = enabled
+        self.hits = hits
+        self.scores = scores
+
+    def to_document(self, min_score=None):
+        """JSON-ready heatmap; `min_score` keeps only flags scoring at least that in some environment."""
+        rows = np.arange(len(self.flag_ids))
+        if min_score is not None and len(rows):
+            rows = rows[(self.scores >= min_score).any(axis=1)]
+        return {
+            "version": self.version,
+            "generated_at": self.generated_at,
+            "environments": list(self.environments),
+            "flags": [{"id": int(self.flag_ids[i]), "key": self.keys[i], "name": self.names[i]} for i in rows],
+            "scores": self.scores[rows].tolist(),
+            "levels": risk_levels(self.scores[rows]).tolist(),
+            "hits_24h": self.hits[rows].tolist(),
+            "enabled": self.enabled[rows].tolist()
+        }
+
+
+class RiskHeatmap:
+    """
+    Cached fleet-wide risk matrix, refreshed incrementally at most every `ttl` seconds,
+    and on the next read after invalidate() (toggles and new flags in this process):
+    - flags: only flags created since the last build are loaded and keyword-scanned
+    - statuses: reloaded only when the sum of FlagStatus versions moved (any toggle)
+    - traffic: kept as hourly (F, E) count slices; closed hours are never re-queried,
+      only the hours since the last refresh are, and slices older than 24h are dropped
+    Scoring itself is a handful of numpy operations over the whole matrix.
+
+    The working arrays below belong to the refresher (under `_lock`) and are only ever
+    rebound, never changed in place. Readers only see `state`, swapped in whole.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self.state = None          # HeatmapState, None until the first refresh
+        self.environments = []
+        self._env_ids = []
+        self.flag_ids = np.zeros(0, dtype=np.int64)
+        self.keys, self.names = [], []
+        self.sensitive = np.zeros(0, dtype=bool)
+        self.mitigated = np.zeros(0, dtype=bool)
+        self.enabled = np.zeros((0, 0), dtype=bool)
+        self.hits = np.zeros((0, 0), dtype=np.int64)
+        self._hourly = {}          # hour bucket start -> (F, E) hit counts
+        self._traffic_since = None # first hour that may still receive hits
+        self._status_version = None
+        self._refreshed_at = None  # monotonic time the last refresh started reading
+        self._invalidated_at = 0.0
+        self._lock = threading.Lock()
+
+    def _due(self):
+        return (
+            self._refreshed_at is None
+            or self._invalidated_at >= self._refreshed_at
+            or time.monotonic() - self._refreshed_at >= self.ttl
+        )
+
+    def get(self):
+        """
+        The current HeatmapState. When a refresh is due one caller runs it; everyone
+        else keeps reading the last published state (only the very first build waits).
+        """
+        if self._due() and self._lock.acquire(blocking=self.state is None):
+            try:
+                if self._due():
+                    with on_primary():  # shared by every client: never built from a lagging replica
+                        self._refresh()
+            finally:
+                self._lock.release()
+        return self.state
+
+    def invalidate(self):
+        """Makes the next get() refresh, even if a refresh is already running (e.g. right after a toggle)."""
+        self._invalidated_at = time.monotonic()
+
+    def _refresh(self):
+        started = time.perf_counter()
+        refreshed_at = time.monotonic()
+        changed = self._load_environments()
+        changed |= self._load_new_flags()
+        changed |= self._load_statuses(force=changed)
+        changed |= self._load_traffic()
+
+        if changed or self.state is None:
+            weights = np.array([SENSITIVITY_WEIGHTS.get(name, 1.0) for name in self.environments])
+            scores = score_matrix(self.sensitive, self.mitigated, self.hits, self.enabled, weights)
+            self.state = HeatmapState(
+                self.state.version + 1 if self.state else 1, datetime.utcnow(), self.environments,
+                self.flag_ids, self.keys, self.names, self.enabled, self.hits, scores
+            )
+        self._refreshed_at = refreshed_at
+        logger.debug(f"Risk heatmap refresh: {len(self.flag_ids)} flags in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def _load_environments(self):
+        rows = db.session.query(Environment.id, Environment.name).order_by(Environment.id).all()
+        environments = [name for _, name in rows]
+        if environments == self.environments:
+            return False
+        # Environments are rare to change: rebuild the per-environment matrices from scratch
+        self.environments = environments
+        self._env_ids = [env_id for env_id, _ in rows]
+        self.enabled = np.zeros((len(self.flag_ids), len(environments)), dtype=bool)
+        self._hourly = {}
+        self._traffic_since = None
+        self._status_version = None
+        return True
+
+    def _load_new_flags(self):
+        last_id = int(self.flag_ids[-1]) if len(self.flag_ids) else 0
+        rows = db.session.query(FeatureFlag.id, FeatureFlag.key, FeatureFlag.name, FeatureFlag.description).filter(
+            FeatureFlag.id > last_id
+        ).order_by(FeatureFlag.id).all()
+        if not rows:
+            return False
+
+        text = [f"{name} {description or ''}" for _, _, name, description in rows]
+        self.flag_ids = np.concatenate([self.flag_ids, np.array([r[0] for r in rows], dtype=np.int64)])
+        self.keys = self.keys + [r[1] for r in rows]
+        self.names = self.names + [r[2] for r in rows]
+        self.sensitive = np.concatenate([self.sensitive, np.array([bool(_sensitive.search(t)) for t in text], dtype=bool)])
+        self.mitigated = np.concatenate([self.mitigated, np.array([bool(_mitigation.search(t)) for t in text], dtype=bool)])
+
+        padding = ((0, len(rows)), (0, 0))
+        self.enabled = np.pad(self.enabled, padding)
+        self._hourly = {bucket: np.pad(counts, padding) for bucket, counts in self._hourly.items()}
+        return True
+
+    def _load_statuses(self, force=False):
+        version = db.session.query(func.count(FlagStatus.id), func.coalesce(func.sum(FlagStatus.version), 0)).one()
+        if not force and tuple(version) == self._status_version:
+            return False
+
+        result = db.session.query(FlagStatus.flag_id, FlagStatus.env_id, func.coalesce(FlagStatus.is_enabled, False))
+        rows = np.array([tuple(r) for r in result], dtype=np.int64).reshape(-1, 3)  # plain tuples: numpy is slow on Row objects
+        enabled = np.zeros((len(self.flag_ids), len(self.environments)), dtype=bool)
+        if len(rows) and len(self.flag_ids):
+            flag_index = np.searchsorted(self.flag_ids, rows[:, 0])
+            env_index = np.searchsorted(self._env_ids, rows[:, 1])
+            known = (flag_index < len(self.flag_ids)) & (self.flag_ids[np.minimum(flag_index, len(self.flag_ids) - 1)] == rows[:, 0])
+            enabled[flag_index[known], env_index[known]] = rows[known, 2].astype(bool)
+        self.enabled = enabled
+        self._status_version = tuple(version)
+        return True
+
+    def _load_traffic(self):
+        now = datetime.utcnow()
+        window_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=WINDOW_HOURS - 1)
+        # Closed hours are final; re-query only from the hour that was open at the last refresh
+        since = max(window_start, self._traffic_since) if self._traffic_since else window_start
+        # Queued telemetry lands with a short delay, so an hour counts as open for one extra minute
+        self._traffic_since = (now - timedelta(minutes=1)).replace(minute=0, second=0, microsecond=0)
+
+        bucket = _hour_bucket(FlagEvaluation.timestamp)
+        rows = db.session.query(bucket, FlagEvaluation.flag_id, FlagEvaluation.environment_name, func.count(FlagEvaluation.id)).filter(
+            FlagEvaluation.timestamp >= since
+        ).group_by(bucket, FlagEvaluation.flag_id, FlagEvaluation.environment_name).all()
+
+        shape = (len(self.flag_ids), len(self.environments))
+        env_index = {name: i for i, name in enumerate(self.environments)}
+        fresh = {}
+        for hour, flag_id, env_name, count in rows:
+            hour = _as_datetime(hour)
+            i = np.searchsorted(self.flag_ids, flag_id)
+            if env_name not in env_index or i >= len(self.flag_ids) or self.flag_ids[i] != flag_id:
+                continue
+            fresh.setdefault(hour, np.zeros(shape, dtype=np.int64))[i, env_index[env_name]] += count
+
+        before = self.hits
+        hourly = {b: counts for b, counts in self._hourly.items() if window_start <= b < since}
+        hourly.update(fresh)
+        self._hourly = hourly
+        self.hits = sum(hourly.values(), np.zeros(shape, dtype=np.int64))
+        return before.shape != self.hits.shape or not np.array_equal(before, self.hits)
+
+
+def _hour_bucket(column):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", column)
+    return func.strftime("%Y-%m-%d %H:00:00", column)
+
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+heatmap = RiskHeatmap()
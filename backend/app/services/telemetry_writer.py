@@ -0,0 +1,105 @@
+import queue
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import insert
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryWriter:
+    """
+    Single writer for evaluation telemetry. The evaluate endpoint enqueues the hit
+    and returns; one background thread drains the queue and writes each batch
+    (FlagEvaluation rows + merged reach sketches) in one transaction.
+    SQLite allows one writer at a time, so funnelling telemetry through a single
+    thread keeps it from contending with flag writes for the database lock.
+    """
+
+    def __init__(self, batch_size=500, interval=0.25, max_queue=50000):
+        self.enabled = False
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app, enabled):
+        self._app = app
+        self.enabled = enabled
+        if enabled:
+            atexit.register(self.flush)
+
+    def submit(self, flag_id, env_name, context_id=None):
+        """Queues one evaluation. Returns False if the queue is full and the hit was dropped."""
+        try:
+            self._queue.put_nowait((flag_id, env_name, context_id, datetime.utcnow()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                    self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            self._write([first] + self._drain(self.batch_size - 1))
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Writes everything queued so far from the calling thread (shutdown, tests, benchmarks)."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def status(self):
+        return {"enabled": self.enabled, "queued": self._queue.qsize(), "dropped": self.dropped}
+
+    def _write(self, batch):
+        from app.models import db, FlagEvaluation
+        from app.services.evaluation import EvaluationService
+        from app.utils import hll
+
+        sketches = defaultdict(hll.empty_sketch)
+        for flag_id, env_name, context_id, at in batch:
+            if context_id:
+                bucket = at.replace(minute=0, second=0, microsecond=0)
+                hll.add(sketches[(flag_id, env_name, bucket)], context_id)
+
+        with self._write_lock, self._app.app_context():
+            try:
+                db.session.execute(insert(FlagEvaluation), [
+                    {"flag_id": flag_id, "environment_name": env_name, "timestamp": at}
+                    for flag_id, env_name, _, at in batch
+                ])
+                EvaluationService.merge_reaches(sketches)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.dropped += len(batch)
+                logger.error(f"Dropped {len(batch)} telemetry events: {e}")
+
+
+telemetry_writer = TelemetryWriter()
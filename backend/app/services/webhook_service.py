@@ -0,0 +1,309 @@
+import hmac
+import json
+import queue
+import random
+import hashlib
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import requests
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from app.models import db, WebhookSubscription, WebhookOutbox, WebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+EVENTS_PER_REQUEST = 50      # Events batched into one POST per subscriber
+CLAIM_LEASE = timedelta(seconds=60)
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_CAP_SECONDS = 3600
+REQUEST_TIMEOUT = 5.0
+
+
+class WebhookService:
+    """
+    Webhook fan-out via a transactional outbox.
+    The request path only inserts an outbox row; the worker (backend/worker.py)
+    expands it into per-subscriber deliveries and sends them with retries, so
+    toggle latency never depends on how many subscribers exist or how slow they are.
+    """
+
+    # --- REQUEST PATH ---
+
+    @staticmethod
+    def enqueue_flag_change(flag, env, status, action, reason):
+        """Stages a 'flag.toggled' event in the caller's transaction. Does not commit."""
+        db.session.add(WebhookOutbox(
+            event_type="flag.toggled",
+            payload={
+                "flag_id": flag.id,
+                "flag_key": flag.key,
+                "environment": env.name,
+                "is_enabled": status["is_enabled"],
+                "version": status["version"],
+                "action": action,
+                "reason": reason,
+                "changed_at": status["updated_at"]
+            }
+        ))
+
+    # --- SUBSCRIPTIONS ---
+
+    @staticmethod
+    def create_subscription(data):
+        """Registers a subscriber. Returns (subscription, signing secret)."""
+        secret = data.secret or secrets.token_hex(32)
+        subscription = WebhookSubscription(url=str(data.url), secret=secret, max_concurrency=data.max_concurrency)
+        try:
+            db.session.add(subscription)
+            db.session.commit()
+            return subscription, secret
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Persistence error: {e}")
+            raise
+
+    @staticmethod
+    def list_subscriptions():
+        return WebhookSubscription.query.filter_by(is_active=True).order_by(WebhookSubscription.id).all()
+
+    @staticmethod
+    def deactivate_subscription(subscription_id):
+        subscription = db.session.get(WebhookSubscription, subscription_id)
+        if not subscription:
+            return False
+        subscription.is_active = False
+        db.session.commit()
+        return True
+
+    # --- WORKER ---
+
+    @staticmethod
+    def fan_out(batch_size=500):
+        """Expands undispatched outbox rows into one pending delivery per active subscriber."""
+        events = db.session.execute(
+            select(WebhookOutbox)
+            .where(WebhookOutbox.dispatched_at.is_(None))
+            .order_by(WebhookOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not events:
+            db.session.rollback()
+            return 0
+
+        subscriber_ids = db.session.execute(
+            select(WebhookSubscription.id).where(WebhookSubscription.is_active.is_(True))
+        ).scalars().all()
+
+        now = datetime.utcnow()
+        db.session.add_all([
+            WebhookDelivery(subscription_id=sub_id, outbox_id=event.id, next_attempt_at=now)
+            for event in events
+            for sub_id in subscriber_ids
+        ])
+        for event in events:
+            event.dispatched_at = now
+        db.session.commit()
+        return len(events)
+
+    @staticmethod
+    def deliver_due(max_subscribers=100):
+        """
+        Records the POSTs that finished since the last pass, then claims and hands out
+        new batches without waiting for them (see DeliveryPool), so a slow subscriber
+        never delays the others. Returns the number of deliveries recorded or claimed.
+        """
+        recorded = WebhookService._record_outcomes(delivery_pool.drain())
+
+        due_subscribers = db.session.execute(
+            select(WebhookDelivery.subscription_id)
+            .where(WebhookDelivery.status == "pending", WebhookDelivery.next_attempt_at <= datetime.utcnow())
+            .group_by(WebhookDelivery.subscription_id)
+            .order_by(func.min(WebhookDelivery.next_attempt_at))
+            .limit(max_subscribers)
+        ).scalars().all()
+        db.session.rollback()
+
+        claimed = 0
+        for sub_id in due_subscribers:
+            if delivery_pool.capacity() <= 0:
+                break
+            for subscription, items, lease_id in WebhookService._claim(sub_id, delivery_pool.capacity()):
+                delivery_pool.submit(subscription, items, lease_id)
+                claimed += len(items)
+        return recorded + claimed
+
+    @staticmethod
+    def _claim(subscription_id, max_batches):
+        """
+        Claims up to one subscriber's free in-flight slots in one short transaction.
+        The subscription row lock serializes claims for a subscriber across workers, and
+        rows leased under one lease_id form one in-flight batch, so at most
+        `max_concurrency` batches are ever in flight per subscriber, however many workers
+        run. Leases are committed before any HTTP call. Returns [(subscription, items, lease_id)].
+        """
+        now = datetime.utcnow()
+        subscription = db.session.execute(
+            select(WebhookSubscription).where(WebhookSubscription.id == subscription_id).with_for_update(skip_locked=True)
+        ).scalar()
+        if subscription is None:
+            # Another worker is claiming for this subscriber right now
+            db.session.rollback()
+            return []
+
+        pending = (WebhookDelivery.subscription_id == subscription_id) & (WebhookDelivery.status == "pending")
+        if not subscription.is_active:
+            db.session.execute(
+                update(WebhookDelivery).where(pending).values(status="dead", last_error="Subscription inactive", lease_id=None)
+            )
+            db.session.commit()
+            return []
+
+        in_flight = db.session.execute(
+            select(func.count(func.distinct(WebhookDelivery.lease_id))).where(
+                pending, WebhookDelivery.lease_id.isnot(None), WebhookDelivery.next_attempt_at > now
+            )
+        ).scalar()
+        slots = min(max_batches, subscription.max_concurrency - in_flight)
+        if slots <= 0:
+            db.session.rollback()
+            return []
+
+        claimed = db.session.execute(
+            select(WebhookDelivery)
+            .options(joinedload(WebhookDelivery.event, innerjoin=True))
+            .where(pending, WebhookDelivery.next_attempt_at <= now)
+            .order_by(WebhookDelivery.next_attempt_at)
+            .limit(slots * EVENTS_PER_REQUEST)
+            .with_for_update(skip_locked=True, of=WebhookDelivery)
+        ).scalars().all()
+
+        # Plain snapshots: the HTTP threads must never touch ORM state
+        snapshot = {"id": subscription.id, "url": subscription.url, "secret": subscription.secret}
+        jobs = []
+        for start in range(0, len(claimed), EVENTS_PER_REQUEST):
+            lease_id = secrets.token_hex(16)
+            batch = claimed[start:start + EVENTS_PER_REQUEST]
+            for delivery in batch:
+                delivery.lease_id = lease_id
+                delivery.next_attempt_at = now + CLAIM_LEASE
+            jobs.append((snapshot, [(d.id, d.outbox_id, d.event.event_type, d.event.payload) for d in batch], lease_id))
+        db.session.commit()
+        return jobs
+
+    @staticmethod
+    def _post_batch(subscription, items):
+        """POSTs one signed batch. Runs off the DB session; returns (delivery_ids, error or None)."""
+        delivery_ids = [item[0] for item in items]
+        body = json.dumps({
+            "events": [{"id": outbox_id, "type": event_type, "data": payload} for _, outbox_id, event_type, payload in items]
+        }, separators=(",", ":")).encode("utf-8")
+        signature = hmac.new(subscription["secret"].encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+        try:
+            response = requests.post(
+                subscription["url"],
+                data=body,
+                headers={"Content-Type": "application/json", "X-SafeConfig-Signature": f"sha256={signature}"},
+                timeout=REQUEST_TIMEOUT
+            )
+            if response.status_code >= 300:
+                return delivery_ids, f"HTTP {response.status_code}"
+            return delivery_ids, None
+        except requests.RequestException as e:
+            return delivery_ids, str(e)[:500]
+
+    @staticmethod
+    def _record_outcomes(outcomes):
+        """
+        Marks batches delivered, or schedules a retry with jittered exponential backoff.
+        Rows whose lease expired and was re-claimed meanwhile are left to the new claim.
+        Returns the number of deliveries recorded.
+        """
+        if not outcomes:
+            return 0
+        now = datetime.utcnow()
+        errors = {
+            (delivery_id, lease_id): error
+            for lease_id, delivery_ids, error in outcomes
+            for delivery_id in delivery_ids
+        }
+        deliveries = WebhookDelivery.query.filter(
+            WebhookDelivery.id.in_({delivery_id for delivery_id, _ in errors}),
+            WebhookDelivery.lease_id.in_({lease_id for lease_id, _, _ in outcomes})
+        ).all()
+        for delivery in deliveries:
+            if (delivery.id, delivery.lease_id) not in errors:
+                continue
+            error = errors[(delivery.id, delivery.lease_id)]
+            delivery.lease_id = None
+            delivery.attempts += 1
+            if error is None:
+                delivery.status = "delivered"
+                delivery.delivered_at = now
+                delivery.last_error = None
+                continue
+
+            delivery.last_error = error
+            if delivery.attempts >= MAX_ATTEMPTS:
+                delivery.status = "dead"
+                logger.warning(f"Webhook delivery {delivery.id} dead after {delivery.attempts} attempts: {error}")
+            else:
+                backoff = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (delivery.attempts - 1))
+                delivery.next_attempt_at = now + timedelta(seconds=backoff * random.uniform(0.5, 1.0))
+        db.session.commit()
+        return len(deliveries)
+
+
+class DeliveryPool:
+    """
+    HTTP side of the webhook worker: a long-lived thread pool that POSTs claimed
+    batches. deliver_due hands batches over and returns; outcomes are queued here and
+    recorded on the next pass. Nothing waits on the slowest subscriber, and because
+    claims are capped per subscriber, a slow one only ever ties up its own slots.
+    """
+
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+        self._executor = None
+        self._running = 0
+        self._outcomes = queue.Queue()
+        self._lock = threading.Lock()
+
+    def capacity(self):
+        """Batches that can start right away (claiming more would only let leases run out in a queue)."""
+        return self.max_workers - self._running
+
+    def submit(self, subscription, items, lease_id):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="webhook")
+            self._running += 1
+        self._executor.submit(self._send, subscription, items, lease_id)
+
+    def _send(self, subscription, items, lease_id):
+        try:
+            delivery_ids, error = WebhookService._post_batch(subscription, items)
+        except Exception as e:
+            delivery_ids, error = [item[0] for item in items], str(e)[:500]
+        finally:
+            with self._lock:
+                self._running -= 1
+        self._outcomes.put((lease_id, delivery_ids, error))
+
+    def drain(self):
+        """Outcomes finished since the last call: [(lease_id, delivery_ids, error or None)]."""
+        outcomes = []
+        while True:
+            try:
+                outcomes.append(self._outcomes.get_nowait())
+            except queue.Empty:
+                return outcomes
+
+
+delivery_pool = DeliveryPool()
@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationGuard:
+    """
+    Overload protection for the SDK evaluate path (per process).
+    - Admission: at most `max_concurrency` evaluations touch the database at once; a
+      request that cannot get a slot within `queue_deadline` seconds is not queued further.
+    - Load shedding: telemetry writes have their own, smaller budget and are the first
+      thing dropped when it is exhausted or the database is slow/failing.
+    - Fail-static: the last flag state read from the database is kept in memory and
+      served (marked stale) when a request is not admitted or the database errors.
+    """
+
+    def __init__(self):
+        self.max_concurrency = 32
+        self.queue_deadline = 0.05      # seconds a request may wait for an evaluation slot
+        self.telemetry_concurrency = 8
+        self.slow_threshold = 0.25      # seconds; slower state reads put the guard in degraded mode
+        self.degraded_cooldown = 5.0    # seconds telemetry stays shed after a slow read or DB error
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._telemetry_slots = threading.BoundedSemaphore(self.telemetry_concurrency)
+        self._last_known = {}           # (flag key, environment name) -> (is_enabled, read_at)
+        self._degraded_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(("admitted", "rejected", "telemetry_recorded", "telemetry_shed", "stale_served", "unavailable", "db_errors"), 0)
+
+    def init_app(self, app):
+        self.max_concurrency = int(os.getenv("EVAL_MAX_CONCURRENCY", self.max_concurrency))
+        self.queue_deadline = float(os.getenv("EVAL_QUEUE_DEADLINE_MS", self.queue_deadline * 1000)) / 1000
+        self.telemetry_concurrency = int(os.getenv("EVAL_TELEMETRY_CONCURRENCY", self.telemetry_concurrency))
+        self.slow_threshold = float(os.getenv("EVAL_SLOW_MS", self.slow_threshold * 1000)) / 1000
+        self.degraded_cooldown = float(os.getenv("EVAL_DEGRADED_COOLDOWN", self.degraded_cooldown))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._telemetry_slots = threading.BoundedSemaphore(self.telemetry_concurrency)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @contextmanager
+    def admit(self):
+        """Yields True if an evaluation slot was obtained within the queue deadline."""
+        admitted = self._slots.acquire(timeout=self.queue_deadline)
+        self._count("admitted" if admitted else "rejected")
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._slots.release()
+
+    @contextmanager
+    def telemetry(self):
+        """Yields True if telemetry may be written now; never waits for a slot."""
+        allowed = not self.degraded and self._telemetry_slots.acquire(blocking=False)
+        self._count("telemetry_recorded" if allowed else "telemetry_shed")
+        try:
+            yield allowed
+        finally:
+            if allowed:
+                self._telemetry_slots.release()
+
+    @property
+    def degraded(self):
+        return time.monotonic() < self._degraded_until
+
+    def mark_degraded(self, reason):
+        if not self.degraded:
+            logger.warning(f"Evaluate path degraded ({reason}); shedding telemetry for {self.degraded_cooldown}s")
+        self._degraded_until = time.monotonic() + self.degraded_cooldown
+
+    def observe_read(self, seconds):
+        if seconds > self.slow_threshold:
+            self.mark_degraded(f"state read took {seconds * 1000:.0f}ms")
+
+    def observe_error(self, error):
+        self._count("db_errors")
+        self.mark_degraded(f"database error: {type(error).__name__}")
+
+    def remember(self, key, env_name, is_enabled):
+        self._last_known[(key, env_name)] = (is_enabled, time.time())
+
+    def last_known(self, key, env_name):
+        """(is_enabled, age in seconds) of the last state read from the database, or None."""
+        known = self._last_known.get((key, env_name))
+        if known is None:
+            self._count("unavailable")
+            return None
+        self._count("stale_served")
+        return known[0], time.time() - known[1]
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "degraded": self.degraded,
+            "max_concurrency": self.max_concurrency,
+            "queue_deadline_ms": round(self.queue_deadline * 1000, 1),
+            "telemetry_concurrency": self.telemetry_concurrency,
+            "known_states": len(self._last_known)
+        }
+
+
+evaluation_guard = EvaluationGuard()
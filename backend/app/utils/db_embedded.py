@@ -0,0 +1,67 @@
+import os
+import logging
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from app.utils.db_pool import InstrumentedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Embedded single-node mode: DATABASE_URL=sqlite:///path/to/safeconfig.db
+# (or sqlite:// for a throwaway in-memory database, e.g. in-process tests and benchmarks).
+#   journal_mode=WAL     readers never block the writer and vice versa
+#   synchronous=NORMAL   fsync at checkpoints only; WAL keeps the file consistent on crash
+#   busy_timeout         wait for the write lock instead of failing with "database is locked"
+#   foreign_keys=ON      SQLite ignores ON DELETE CASCADE without it
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))),
+    ("foreign_keys", "ON"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -int(os.getenv("SQLITE_CACHE_KB", 32768))), # negative = KiB
+    ("mmap_size", int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)))
+)
+
+
+def is_embedded(db_url):
+    return bool(db_url) and db_url.startswith("sqlite")
+
+
+def is_in_memory(db_url):
+    return db_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in db_url
+
+
+def embedded_engine_options(db_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for SQLite."""
+    if is_in_memory(db_url):
+        # One shared connection, otherwise every checkout would see its own empty database.
+        # Meant for single-threaded in-process test and benchmark runs: the connection is not
+        # safe to use from two threads at once, so create_app turns the background writers
+        # off in this mode (AI traces dropped, telemetry and reach written inline).
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "connect_args": {"check_same_thread": False, "timeout": 30}
+    }
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def init_embedded(app, db):
+    """Applies the pragmas to every new connection of each SQLite engine."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _apply_pragmas)
+                logger.info(f"Embedded SQLite engine '{key or 'primary'}' ready (WAL)")
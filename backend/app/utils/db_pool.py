@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Pool profiles (DB_POOL_PROFILE):
+#   serverless - NullPool: no idle connections survive between invocations, so a fleet
+#                of instances cannot exhaust Postgres max_connections. Also the right
+#                choice behind an external pooler (PgBouncer / Supavisor / RDS Proxy).
+#   server     - tuned QueuePool for long-running gunicorn workers.
+# Defaults to serverless on Vercel and server everywhere else.
+POOL_PROFILES = ("serverless", "server")
+
+
+class PoolTelemetry:
+    """Checkout-wait and saturation counters for one engine's pool."""
+
+    def __init__(self, window=1024):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._recent = deque(maxlen=window)
+        self._last_saturation_warning = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait_ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._recent.append(wait_ms)
+
+    def warn_if_saturated(self, pool):
+        """Rate-limited warning once a QueuePool is at >= 90% of its capacity."""
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        if capacity and pool.checkedout() / capacity >= 0.9 and time.monotonic() - self._last_saturation_warning > 30:
+            self._last_saturation_warning = time.monotonic()
+            logger.warning(f"DB pool saturated: {pool.checkedout()}/{capacity} connections checked out")
+
+    def snapshot(self, pool):
+        with self._lock:
+            recent = sorted(self._recent)
+        stats = {
+            "pool_class": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "p95_wait_ms": round(recent[int(len(recent) * 0.95) - 1], 3) if recent else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3)
+        }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else None
+            })
+        return stats
+
+
+class _InstrumentedPoolMixin:
+    """Times every checkout (queue wait, or connect time for NullPool)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.telemetry.record(0.0, timed_out=True)
+            raise
+        self.telemetry.record((time.perf_counter() - started) * 1000)
+        if isinstance(self, QueuePool):
+            self.telemetry.warn_if_saturated(self)
+        return conn
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    pass
+
+
+def resolve_pool_profile():
+    profile = os.getenv("DB_POOL_PROFILE") or ("serverless" if os.getenv("VERCEL") else "server")
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"DB_POOL_PROFILE must be one of {POOL_PROFILES}, got '{profile}'")
+    return profile
+
+
+def build_engine_options(profile):
+    """SQLALCHEMY_ENGINE_OPTIONS for a pool profile (applies to the primary and every replica bind)."""
+    if profile == "serverless":
+        return {"poolclass": InstrumentedNullPool}
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 280)), # Below Railway's 300s idle timeout
+        "pool_pre_ping": True,
+        "pool_use_lifo": True # Reuse hot connections so surplus ones can age out
+    }
+
+
+def warm_pool(engine, count):
+    """Opens `count` connections up front so the first requests skip the connect handshake."""
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    except Exception as e:
+        logger.warning(f"Pool warm-up stopped after {len(connections)} connections: {e}")
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def pool_stats(engines):
+    """Telemetry for every engine, keyed 'primary' or by replica bind key."""
+    return {
+        (key or "primary"): engine.pool.telemetry.snapshot(engine.pool)
+        for key, engine in engines.items()
+        if hasattr(engine.pool, "telemetry")
+    }
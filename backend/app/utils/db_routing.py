@@ -0,0 +1,202 @@
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+# Replicas are configured as extra binds named replica_0, replica_1, ...
+# (see DATABASE_REPLICA_URLS in create_app). Models never bind to them directly;
+# RoutingSession sends reads there only inside routes marked with @read_replica.
+REPLICA_BIND_PREFIX = "replica_"
+
+
+class ReplicaRouter:
+    """
+    Read/write routing state shared by every session in the process:
+    - replica health (cached ping + replication lag check, failover on errors)
+    - read-your-writes windows (clients that just wrote read from the primary)
+    """
+
+    def __init__(self):
+        self.max_lag = 5.0          # seconds of replication lag a replica may carry
+        self.health_ttl = 10.0      # seconds between health probes per replica
+        self._health = {}           # bind key -> (healthy, checked_at)
+        self._recent_writers = {}   # client identity -> time of last committed write
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.max_lag = float(app.config.get("REPLICA_MAX_LAG", self.max_lag))
+        self.health_ttl = float(app.config.get("REPLICA_HEALTH_TTL", self.health_ttl))
+
+        with app.app_context():
+            for key, engine in db.engines.items():
+                if key and key.startswith(REPLICA_BIND_PREFIX):
+                    event.listen(engine, "handle_error", self._on_replica_error(key))
+
+    def _on_replica_error(self, key):
+        def handler(context):
+            # Fail over immediately; the next probe after health_ttl may bring it back.
+            logger.warning(f"Replica '{key}' errored ({context.original_exception}); routing reads to primary")
+            with self._lock:
+                self._health[key] = (False, time.monotonic())
+        return handler
+
+    def mark_write(self, identity):
+        """Pins `identity` to the primary until replicas have had time to catch up."""
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writers[identity] = now
+            if len(self._recent_writers) > 10000:
+                cutoff = now - self.max_lag
+                self._recent_writers = {k: t for k, t in self._recent_writers.items() if t >= cutoff}
+
+    def wrote_recently(self, identity):
+        written_at = self._recent_writers.get(identity)
+        return written_at is not None and time.monotonic() - written_at < self.max_lag
+
+    def pick_replica(self, engines):
+        """Round-robins over healthy replicas; None means use the primary."""
+        keys = sorted(k for k in engines if k and k.startswith(REPLICA_BIND_PREFIX))
+        if not keys:
+            return None
+        start = next(self._cycle)
+        for offset in range(len(keys)):
+            key = keys[(start + offset) % len(keys)]
+            if self._is_healthy(key, engines[key]):
+                return engines[key]
+        return None
+
+    def _is_healthy(self, key, engine):
+        healthy, checked_at = self._health.get(key, (None, 0.0))
+        if healthy is not None and time.monotonic() - checked_at < self.health_ttl:
+            return healthy
+
+        try:
+            with engine.connect() as conn:
+                conn.execution_options(budget_exempt=True)  # routing overhead, not the request's own work
+                lag = 0.0
+                if engine.dialect.name == "postgresql":
+                    lag = conn.execute(text(
+                        "SELECT CASE WHEN pg_is_in_recovery() "
+                        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                        "ELSE 0 END"
+                    )).scalar() or 0.0
+                else:
+                    conn.execute(text("SELECT 1"))
+            healthy = float(lag) <= self.max_lag
+            if not healthy:
+                logger.warning(f"Replica '{key}' lagging {float(lag):.1f}s; routing reads to primary")
+        except Exception as e:
+            logger.warning(f"Replica '{key}' health probe failed: {e}")
+            healthy = False
+
+        with self._lock:
+            self._health[key] = (healthy, time.monotonic())
+        return healthy
+
+    def status(self):
+        """Snapshot of the last known replica health, for health endpoints."""
+        return {key: healthy for key, (healthy, _) in self._health.items()}
+
+
+router = ReplicaRouter()
+
+
+def _client_identity():
+    """The JWT subject when authenticated (set by user_lookup_callback), else the caller's address."""
+    return g.get("user_id") or request.remote_addr
+
+
+def _is_write(clause):
+    """DML statements, including SELECTs wrapping a data-modifying CTE (see FlagService._apply_toggle)."""
+    if isinstance(clause, UpdateBase):
+        return True
+    if getattr(clause, "_for_update_arg", None) is not None:
+        return True
+    froms = clause.get_final_froms() if hasattr(clause, "get_final_froms") else ()
+    return any(isinstance(getattr(f, "element", None), UpdateBase) for f in froms)
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends reads issued inside @read_replica routes
+    to a healthy replica. Writes, flushes, locking reads and any client that wrote
+    within REPLICA_MAX_LAG seconds always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or (clause is not None and _is_write(clause)):
+                self.info["wrote"] = True
+            elif self._wants_replica():
+                engine = router.pick_replica(self._db.engines)
+                if engine is not None:
+                    g.db_replica_used = True
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _wants_replica(self):
+        if not has_request_context() or not g.get("db_read_only"):
+            return False
+        if self.info.get("wrote") or self.new or self.dirty or self.deleted:
+            return False
+        return not router.wrote_recently(_client_identity())
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session):
+    if session.info.pop("wrote", False) and has_request_context():
+        router.mark_write(_client_identity())
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+
+@contextmanager
+def on_primary():
+    """
+    Serves every read in the block from the primary, even inside @read_replica routes.
+    For caches shared by all clients: built from a lagging replica, they would hand
+    pre-write state to a client that was promised read-your-writes.
+    """
+    if not has_request_context():
+        yield
+        return
+    read_only = g.get("db_read_only", False)
+    g.db_read_only = False
+    try:
+        yield
+    finally:
+        g.db_read_only = read_only
+
+
+def read_replica(fn):
+    """
+    Marks a route as read-only so its queries may be served by a replica.
+    If a replica fails mid-request (it is then marked unhealthy), the view
+    is retried once against the primary instead of surfacing the error.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError:
+            if not g.pop("db_replica_used", False):
+                raise
+            from app import db
+            db.session.rollback()
+            g.db_read_only = False
+            return fn(*args, **kwargs)
+    return wrapper
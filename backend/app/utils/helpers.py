@@ -1,6 +1,59 @@
-from flask import jsonify
+import io
+import os
+import sys
+import csv
+import gzip
+import json
+import base64
+import random
+from datetime import datetime, date, timezone
+from decimal import Decimal
+from flask import current_app, request
 from loguru import logger
 
+try:
+    import orjson  # Optional: ~5-10x faster encoding than the stdlib
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Success lines are sampled (errors are always logged); gzip kicks in above this size.
+LOG_SAMPLE_RATE = float(os.getenv("API_LOG_SAMPLE_RATE", "0.1"))
+GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES", "1024"))
+
+def _json_default(value):
+    """Encodes the non-JSON types our payloads carry."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_json(payload) -> bytes:
+    """Serializes a payload to compact JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+class RawJSON:
+    """
+    A payload that is already serialized. Cached responses store one of these
+    so repeat hits skip encoding (and, for large bodies, re-compression).
+    """
+    __slots__ = ("body", "_gzipped")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._gzipped = {}
+
+    @classmethod
+    def of(cls, payload):
+        return cls(encode_json(payload))
+
+def configure_logging():
+    """Moves loguru output onto a background queue so request threads never block on log I/O."""
+    logger.remove()
+    logger.add(sys.stderr, enqueue=True, level=os.getenv("LOG_LEVEL", "INFO"))
+
 def api_response(success: bool, message: str, data: any = None, status_code: int = 200):
     """
     Standardizes the API response format across the entire application.
@@ -12,19 +65,31 @@ def api_response(success: bool, message: str, data: any = None, status_code: int
         "message": "Human readable summary",
         "data": { ... } or None
     }
+
+    `data` may be a RawJSON to splice pre-serialized bytes into the envelope.
+    Bodies over GZIP_MIN_BYTES are gzip-compressed when the client accepts it.
     """
-    # Log the response summary for better server-side visibility
-    if success:
-        logger.info(f"API Success [{status_code}]: {message}")
-    else:
+    # Log the response summary for better server-side visibility (successes are sampled)
+    if not success:
         logger.warning(f"API Error [{status_code}]: {message}")
+    elif LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE:
+        logger.info(f"API Success [{status_code}]: {message}")
 
-    response = {
-        "success": success,
-        "message": message,
-        "data": data
-    }
-    return jsonify(response), status_code
+    head = b'{"success":' + (b"true" if success else b"false") + b',"message":' + encode_json(message) + b',"data":'
+    data_body = data.body if isinstance(data, RawJSON) else encode_json(data)
+    body = head + data_body + b"}"
+
+    response = current_app.response_class(body, status=status_code, mimetype="application/json")
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        if isinstance(data, RawJSON):
+            if message not in data._gzipped:
+                data._gzipped[message] = gzip.compress(body, compresslevel=5)
+            response.set_data(data._gzipped[message])
+        else:
+            response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+    return response, status_code
 
 def format_error(message: str, details: any = None):
     """
@@ -45,4 +110,74 @@ def parse_pydantic_errors(validation_error):
     return [
         {"field": str(err["loc"][-1]), "message": err["msg"]}
         for err in validation_error.errors()
-    ]
\ No newline at end of file
+    ]
+
+def parse_iso_datetime(value: str):
+    """
+    Parses an ISO-8601 query parameter into a naive UTC datetime
+    (the ledger stores naive UTC timestamps). Returns None for empty input
+    and raises ValueError for malformed values.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_if_match(value: str):
+    """
+    Extracts the expected FlagStatus version from an If-Match header
+    ('"3"', 'W/"3"' or '*'). Returns None when absent or '*'; raises
+    ValueError for anything else.
+    """
+    if not value or value.strip() == "*":
+        return None
+    tag = value.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return int(tag.strip('"'))
+
+def encode_cursor(values) -> str:
+    """Opaque, URL-safe keyset cursor (e.g. the last row's sort value and id)."""
+    return base64.urlsafe_b64encode(encode_json(list(values))).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor(). Raises ValueError for tampered or malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Malformed cursor")
+    return values
+
+def _export_value(value):
+    """Normalizes a DB value for text exports (datetimes -> ISO, dicts -> JSON)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+def stream_ndjson(rows):
+    """Encodes an iterable of dict rows as newline-delimited JSON, one line per row."""
+    for row in rows:
+        yield encode_json(row) + b"\n"
+
+def stream_csv(rows, fieldnames):
+    """
+    Encodes an iterable of dict rows as CSV. Only one row is buffered at a
+    time, so the generator can back an arbitrarily large streamed download.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: _export_value(v) for k, v in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
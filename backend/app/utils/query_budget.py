@@ -0,0 +1,178 @@
+import os
+import sys
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Query budgets catch N+1 regressions: every SQL statement issued while a QueryLog is
+# active is recorded with the application line that caused it.
+#   QUERY_BUDGET_MODE     warn (default) logs offenders; raise (default when app.testing)
+#                         fails the statement that crosses the budget, before it runs,
+#                         so an over-budget request never commits; off disables checks
+#   QUERY_BUDGET_DEFAULT  budget for endpoints without an explicit @query_budget
+# Infrastructure statements that are not the endpoint's own work (replica health probes,
+# inline reach flushes) run with execution_options(budget_exempt=True) and are not counted.
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_active_logs = ContextVar("active_query_logs", default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    """
+    Statements issued inside one count_queries() block. With `limit` set and
+    strict=True, the statement that would exceed it raises QueryBudgetExceeded
+    before it runs, so the transaction it belongs to can never commit.
+    """
+
+    def __init__(self, limit=None, label=None, strict=False):
+        self.statements = []  # (call site, SQL)
+        self.limit = limit
+        self.label = label
+        self.strict = strict
+        self.exceeded = False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def by_call_site(self):
+        """[(call site, statement count, most repeated SQL)] with the busiest call site first."""
+        counts = Counter(site for site, _ in self.statements)
+        per_site = {}
+        for site, sql in self.statements:
+            per_site.setdefault(site, Counter())[sql] += 1
+        return [(site, n, per_site[site].most_common(1)[0][0]) for site, n in counts.most_common()]
+
+    def report(self):
+        return "\n".join(
+            f"  {n}x {site}: {' '.join(sql.split())[:200]}"
+            for site, n, sql in self.by_call_site()
+        )
+
+    def message(self):
+        return f"Query budget exceeded in {self.label}: {self.count} statements (budget {self.limit})\n{self.report()}"
+
+    def check(self):
+        """
+        Called after the block. Strict logs re-raise if the budget was hit (in case the
+        code in between swallowed the exception); others warn once over budget.
+        """
+        if self.strict and self.exceeded:
+            raise QueryBudgetExceeded(self.message())
+        if self.limit is not None and self.count > self.limit:
+            logger.warning(self.message())
+
+
+def _call_site():
+    """First frame inside the application package, outside this module."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT) and filename != __file__:
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_ROOT))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<outside app>"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    logs = _active_logs.get()
+    if logs and not conn.get_execution_options().get("budget_exempt"):
+        entry = (_call_site(), statement)
+        for log in logs:
+            if log.strict and log.limit is not None and log.count >= log.limit:
+                log.exceeded = True
+                log.statements.append(entry)
+                raise QueryBudgetExceeded(log.message())
+            log.statements.append(entry)
+
+
+@event.listens_for(Engine, "commit")
+def _block_commit(conn):
+    """A caller that swallowed QueryBudgetExceeded still cannot commit the over-budget work."""
+    for log in _active_logs.get():
+        if log.exceeded:
+            raise QueryBudgetExceeded(log.message())
+
+
+@contextmanager
+def count_queries(limit=None, label=None, strict=False):
+    """Records every statement issued inside the block. Blocks may nest."""
+    log = QueryLog(limit, label, strict)
+    token = _active_logs.set(_active_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+
+def _mode():
+    if has_request_context():
+        return current_app.config.get("QUERY_BUDGET_MODE") or ("raise" if current_app.testing else "warn")
+    return os.getenv("QUERY_BUDGET_MODE", "warn")
+
+
+def query_budget(limit, per_item=0, items=None):
+    """
+    Caps the statements a view (or any function) may issue, JWT user lookup included
+    when placed directly under @route. Endpoints without one get QUERY_BUDGET_DEFAULT.
+    Work that grows with the request's size declares it: the budget is then
+    `limit + per_item * items()`, with `items` evaluated before the call (e.g. the
+    number of targets in the body, capped by its schema).
+    In raise mode the budget is enforced as statements are issued (see QueryLog).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            mode = _mode()
+            if mode == "off":
+                return fn(*args, **kwargs)
+            budget = limit + (per_item * items() if per_item else 0)
+            label = request.endpoint if has_request_context() else fn.__qualname__
+            with count_queries(budget, label, strict=mode == "raise") as log:
+                result = fn(*args, **kwargs)
+            log.check()
+            return result
+        wrapper._query_budget = limit
+        wrapper._query_budget_per_item = per_item
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Applies QUERY_BUDGET_DEFAULT to every request whose view has no explicit budget."""
+    app.config.setdefault("QUERY_BUDGET_MODE", os.getenv("QUERY_BUDGET_MODE"))
+    app.config.setdefault("QUERY_BUDGET_DEFAULT", int(os.getenv("QUERY_BUDGET_DEFAULT", 20)))
+
+    @app.before_request
+    def _start_request_log():
+        view = app.view_functions.get(request.endpoint)
+        mode = _mode()
+        if view is not None and not hasattr(view, "_query_budget") and mode != "off":
+            log = QueryLog(app.config["QUERY_BUDGET_DEFAULT"], request.endpoint, strict=mode == "raise")
+            g._query_log = (log, _active_logs.set(_active_logs.get() + (log,)))
+
+    @app.after_request
+    def _check_request_log(response):
+        entry = g.pop("_query_log", None)
+        if entry is not None:
+            log, token = entry
+            _active_logs.reset(token)
+            log.check()
+        return response
+
+    @app.teardown_request
+    def _discard_request_log(exc):
+        entry = g.pop("_query_log", None)
+        if entry is not None:
+            _active_logs.reset(entry[1])
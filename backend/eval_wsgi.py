@@ -0,0 +1,10 @@
+import os
+from app.eval_server import create_eval_app
+
+# Standalone evaluation server (evaluate, bulk-evaluate, telemetry ingestion).
+# Deploy and scale it separately from the management API, e.g.:
+#   gunicorn -w 4 --threads 8 eval_wsgi:app
+app = create_eval_app()
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("EVAL_PORT", 5001)))
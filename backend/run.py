@@ -53,7 +53,7 @@ if __name__ == "__main__":
     # 1. Physical Layer: Create Postgres tables based on models.py
     # Use this for initial setup; in production, use flask-migrate
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)  # primary only; replicas get the schema through replication
         logger.info("Schema synchronization complete.")
     
     # 2. Logic Layer: Seed data so the demo works out-of-the-box
@@ -0,0 +1,116 @@
+import os
+import logging
+import pytest
+from flask import Flask
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+
+# Runs against a throwaway SQLite file by default. Point TEST_DATABASE_URL at a scratch
+# Postgres database to run the suite, Postgres-only statements included, for real:
+#   cd backend && python -m pytest -q
+#   TEST_DATABASE_URL=postgresql://localhost/safeconfig_test python -m pytest -q
+
+FLAG_COUNT = 60
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    os.environ["TELEMETRY_WRITER"] = "inline"  # the heavier path: telemetry written by the request itself
+    os.environ["GROQ_API_KEY"] = ""            # AI audits fall back to the offline default report
+    os.environ.pop("QUERY_BUDGET_MODE", None)  # app.testing selects raise mode
+
+    from app import create_app, db
+    from app.models import User, Environment, FeatureFlag, FlagStatus, FlagEvaluation, AuditLog
+
+    app = create_app()
+    app.testing = True
+    with app.app_context():
+        db.create_all(bind_key=None)
+        environments = [Environment(name=name) for name in ("Development", "Staging", "Production")]
+        db.session.add_all(environments)
+        for email, role in (("manager@safeconfig.io", "manager"), ("dev@safeconfig.io", "developer")):
+            user = User(email=email, role=role)
+            user.set_password("password123")
+            db.session.add(user)
+        db.session.commit()
+
+        now = datetime.utcnow()
+        db.session.execute(insert(FeatureFlag), [
+            {"key": f"flag_{i}", "name": f"Flag {i}", "description": "payment checkout" if i % 3 == 0 else "ui tweak"}
+            for i in range(FLAG_COUNT)
+        ])
+        db.session.execute(insert(FlagStatus), [
+            {"flag_id": i + 1, "env_id": env.id, "is_enabled": False, "version": 1}
+            for i in range(FLAG_COUNT) for env in environments
+        ])
+        db.session.execute(insert(FlagEvaluation), [
+            {"flag_id": i % 10 + 1, "environment_name": "Production", "timestamp": now - timedelta(minutes=i)}
+            for i in range(200)
+        ])
+        db.session.execute(insert(AuditLog), [
+            {"flag_id": i + 1, "env_name": "Production", "action": "AI_BLOCK", "reason": "seed", "risk_score": 9, "risk_level": "high"}
+            for i in range(10)
+        ])
+        db.session.commit()
+
+    yield app
+
+    from app.services.evaluation import reach_buffer
+    reach_buffer.flush()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture(scope="session")
+def environments(app):
+    from app.models import Environment
+    with app.app_context():
+        return {env.name: env.id for env in Environment.query.all()}
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _login(app, email):
+    response = app.test_client().post("/api/auth/login", json={"email": email, "password": "password123"})
+    return {"Authorization": f"Bearer {response.get_json()['data']['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def manager_headers(app):
+    return _login(app, "manager@safeconfig.io")
+
+
+@pytest.fixture(scope="session")
+def developer_headers(app):
+    return _login(app, "dev@safeconfig.io")
+
+
+@pytest.fixture
+def database_app(monkeypatch):
+    """
+    Builds bare Flask apps on their own databases (primary URL plus optional replica
+    URLs), configured exactly like create_app's database layer but without the API.
+    """
+    from app.database import db, configure_database
+    apps = []
+
+    def build(url, replica_urls=()):
+        monkeypatch.setenv("DATABASE_URL", url)
+        monkeypatch.setenv("DATABASE_REPLICA_URLS", ",".join(replica_urls))
+        app = Flask(__name__)
+        configure_database(app, logging.getLogger(__name__))
+        apps.append(app)
+        return app
+
+    yield build
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
@@ -0,0 +1,19 @@
+import pytest
+from app.services.ai_tracing import trace_recorder
+
+
+def test_fallback_without_a_client_is_traced(client, manager_headers, developer_headers, environments):
+    if not trace_recorder.enabled:
+        pytest.skip("traces are off on in-memory SQLite")
+
+    response = client.post(
+        "/api/flags/3/audit", json={"environment_id": environments["Production"], "reason": "trace check"}, headers=manager_headers
+    )
+    assert response.get_json()["data"]["advice"].startswith("System Warning")
+    trace_recorder.flush()
+
+    series = client.get("/api/ai/traces/stats", headers=developer_headers).get_json()["data"]["series"]
+    latest = series[-1]
+    assert latest["calls"] >= 1
+    assert latest["unconfigured_rate"] > 0
+    assert latest["error_rate"] >= latest["unconfigured_rate"]
@@ -0,0 +1,36 @@
+import pytest
+from app.utils.helpers import encode_cursor
+
+
+@pytest.mark.parametrize("sort", ["key", "-name", "created_at"])
+def test_cursor_walks_the_catalog_once(client, developer_headers, sort):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 25, "sort": sort, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/flags", query_string=params, headers=developer_headers)
+        assert response.status_code == 200
+        seen += [flag["id"] for flag in response.get_json()["data"]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) >= 60
+
+
+@pytest.mark.parametrize("sort, values", [
+    ("key", ["x", "y"]),
+    ("key", [1, 2]),
+    ("key", ["flag_1", True]),
+    ("created_at", [12345, 1]),
+    ("created_at", ["not a date", 1]),
+    ("name", ["a"]),
+])
+def test_tampered_cursor_returns_400(client, developer_headers, sort, values):
+    response = client.get(
+        "/api/flags", query_string={"sort": sort, "cursor": encode_cursor(values)}, headers=developer_headers
+    )
+    assert response.status_code == 400
+
+
+def test_garbage_cursor_returns_400(client, developer_headers):
+    response = client.get("/api/flags", query_string={"cursor": "%%%not-base64"}, headers=developer_headers)
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from app import db
+from app.models import FlagEvaluation
+from app.services.dashboard import dashboard
+
+
+def _summary(client, headers, etag=None):
+    return client.get("/api/flags/summary", headers={**headers, **({"If-None-Match": etag} if etag else {})})
+
+
+def _hits(document, flag_id, environment):
+    return next(flag for flag in document["flags"] if flag["id"] == flag_id)["hits_24h"][environment]
+
+
+def test_evaluations_alone_keep_the_etag_until_the_traffic_refresh(app, client, developer_headers):
+    dashboard.invalidate()
+    first = _summary(client, developer_headers)
+    etag = first.headers["ETag"]
+
+    with app.app_context():
+        db.session.add_all([FlagEvaluation(flag_id=50, environment_name="Production") for _ in range(3)])
+        db.session.commit()
+
+    dashboard._checked_at = 0.0  # the fingerprint is checked, and has not moved
+    assert _summary(client, developer_headers, etag).status_code == 304
+
+    dashboard._checked_at = dashboard._traffic_at = 0.0  # the traffic counters are due
+    second = _summary(client, developer_headers, etag)
+    assert second.status_code == 200 and second.headers["ETag"] != etag
+    before, after = first.get_json()["data"], second.get_json()["data"]
+    assert _hits(after, 50, "Production") == _hits(before, 50, "Production") + 3
+
+
+def test_toggle_shows_on_the_next_read(client, manager_headers, developer_headers, environments):
+    etag = _summary(client, developer_headers).headers["ETag"]
+    response = client.patch(
+        "/api/flags/50/toggle", json={"environment_id": environments["Staging"], "reason": "summary check"},
+        headers=manager_headers
+    )
+    assert response.status_code == 200
+
+    summary = _summary(client, developer_headers, etag)
+    assert summary.status_code == 200
+    document = summary.get_json()["data"]
+    flag = next(flag for flag in document["flags"] if flag["id"] == 50)
+    assert flag["statuses"]["Staging"]["is_enabled"] == response.get_json()["data"]["is_enabled"]
+    assert flag["key"] in [entry["flag_key"] for entry in document["ledger"] if entry["reason"] == "summary check"]
+
+
+def test_body_and_version_are_published_together(app):
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            document = dashboard.document
+            if hashlib.sha256(document.body.body).hexdigest()[:16] != document.version:
+                errors.append(document.version)
+
+    with app.app_context():
+        dashboard.get()
+        reader = threading.Thread(target=read)
+        reader.start()
+        for _ in range(20):
+            dashboard.invalidate()
+            dashboard._traffic_at = 0.0
+            db.session.add(FlagEvaluation(flag_id=51, environment_name="Development"))
+            db.session.commit()
+            dashboard.get()
+        done.set()
+        reader.join()
+
+    assert not errors
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import insert
+from app import db
+from app.models import Environment
+from app.utils.db_routing import read_replica, on_primary, router
+
+
+def _names():
+    return sorted(name for (name,) in db.session.query(Environment.name))
+
+
+@pytest.fixture
+def replicated(database_app, tmp_path):
+    """A primary and a replica file that hold different rows, so every read shows where it went."""
+    app = database_app(f"sqlite:///{tmp_path / 'primary.db'}", [f"sqlite:///{tmp_path / 'replica.db'}"])
+    router._health.clear()
+
+    @app.route("/environments")
+    @read_replica
+    def list_environments():
+        return {"names": _names()}
+
+    @app.route("/environments", methods=["POST"])
+    def add_environment():
+        db.session.add(Environment(name="Written"))
+        db.session.commit()
+        return {"names": _names()}
+
+    @app.route("/environments/draft")
+    @read_replica
+    def flush_then_read():
+        db.session.add(Environment(name="Draft"))
+        db.session.flush()
+        names = _names()
+        db.session.rollback()
+        return {"names": names}
+
+    @app.route("/environments/shared")
+    @read_replica
+    def build_shared_cache():
+        with on_primary():
+            shared = _names()
+        return {"names": shared + _names()}
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.metadata.create_all(db.engines["replica_0"])
+        db.session.execute(insert(Environment), [{"name": "Primary"}])
+        db.session.commit()
+        with db.engines["replica_0"].begin() as conn:
+            conn.execute(insert(Environment), [{"name": "Replica"}])
+
+    yield app
+    router._health.clear()
+
+
+def _get(client, url, address, method="GET"):
+    return client.open(url, method=method, environ_base={"REMOTE_ADDR": address}).get_json()["names"]
+
+
+def test_read_only_routes_use_the_replica(replicated):
+    assert _get(replicated.test_client(), "/environments", "10.0.0.1") == ["Replica"]
+
+
+def test_flushes_inside_read_only_routes_stay_on_the_primary(replicated):
+    client = replicated.test_client()
+    assert _get(client, "/environments/draft", "10.0.0.2") == ["Draft", "Primary"]
+    with replicated.app_context():
+        with db.engines["replica_0"].connect() as conn:
+            assert [name for (name,) in conn.execute(Environment.__table__.select().with_only_columns(Environment.name))] == ["Replica"]
+
+
+def test_writers_read_their_writes_from_the_primary(replicated):
+    client = replicated.test_client()
+    assert _get(client, "/environments", "10.0.0.3", method="POST") == ["Primary", "Written"]
+    assert _get(client, "/environments", "10.0.0.3") == ["Primary", "Written"]
+    assert _get(client, "/environments", "10.0.0.4") == ["Replica"]
+
+
+def test_failing_replica_falls_back_to_the_primary(replicated):
+    with replicated.app_context():
+        with db.engines["replica_0"].begin() as conn:
+            conn.exec_driver_sql("DROP TABLE environments")
+
+    client = replicated.test_client()
+    assert _get(client, "/environments", "10.0.0.5") == ["Primary"]
+    assert router.status() == {"replica_0": False}
+    assert _get(client, "/environments", "10.0.0.6") == ["Primary"]
+
+
+def test_shared_caches_are_built_on_the_primary(replicated):
+    assert _get(replicated.test_client(), "/environments/shared", "10.0.0.7") == ["Primary", "Replica"]
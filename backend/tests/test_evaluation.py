@@ -0,0 +1,38 @@
+import os
+import sys
+import subprocess
+import pytest
+from app import db
+from app.models import FlagReachSketch
+from app.services.evaluation import EvaluationService, reach_buffer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_failed_reach_merge_keeps_sketches(app, monkeypatch):
+    def failing_merge(sketches):
+        raise RuntimeError("database went away")
+
+    reach_buffer.flush()
+    monkeypatch.setattr(EvaluationService, "merge_reaches", failing_merge)
+    reach_buffer.add(5, "Staging", "visitor-a")
+    reach_buffer.flush()
+    assert len(reach_buffer._sketches) == 1
+
+    monkeypatch.undo()
+    reach_buffer.add(5, "Staging", "visitor-b")
+    reach_buffer.flush()
+    assert not reach_buffer._sketches
+    with app.app_context():
+        assert db.session.query(FlagReachSketch).filter_by(flag_id=5, environment_name="Staging").count() == 1
+
+
+@pytest.mark.skipif(os.getenv("TEST_DATABASE_URL") == "sqlite://", reason="already running in-memory")
+def test_suite_passes_on_in_memory_sqlite():
+    """In-memory SQLite flushes reach sketches on the request's thread: rerun the suite in that mode."""
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "tests"],
+        cwd=BACKEND_DIR, env={**os.environ, "TEST_DATABASE_URL": "sqlite://"},
+        capture_output=True, text=True, timeout=600
+    )
+    assert result.returncode == 0, result.stdout[-4000:]
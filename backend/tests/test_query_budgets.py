@@ -0,0 +1,119 @@
+import logging
+import pytest
+from sqlalchemy import insert, select, func
+from app import db
+from app.models import Environment
+from app.routes import flag_routes
+from app.services.dashboard import dashboard
+from app.services.risk_heatmap import heatmap
+from app.utils.query_budget import QueryBudgetExceeded, count_queries, query_budget
+
+# Statements some endpoints issue only on Postgres. On SQLite they are added to the
+# measured count, so a budget that would be exceeded in production fails here too.
+POSTGRES_ONLY_STATEMENTS = {
+    "flags.track_traffic": 1,  # SET LOCAL statement_timeout before the state read
+}
+
+
+def request_within_budget(app, client, method, url, items=0, **kwargs):
+    """Issues one request and asserts it stays within its endpoint's declared budget."""
+    endpoint = app.url_map.bind("localhost").match(url.split("?")[0], method=method)[0]
+    view = app.view_functions[endpoint]
+    budget = view._query_budget + view._query_budget_per_item * items
+
+    with count_queries() as log:
+        response = client.open(url, method=method, **kwargs)
+
+    statements = log.count
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            statements += POSTGRES_ONLY_STATEMENTS.get(endpoint, 0)
+
+    assert response.status_code < 400, response.get_json()
+    assert statements <= budget, f"{endpoint}: {statements} statements (budget {budget})\n{log.report()}"
+    return response
+
+
+def test_list_flags_is_constant_in_page_size(app, client, developer_headers):
+    response = request_within_budget(app, client, "GET", "/api/flags?limit=500", headers=developer_headers)
+    assert len(response.get_json()["data"]) > 50
+
+
+def test_toggle(app, client, manager_headers, environments):
+    for env_name in ("Development", "Production"):
+        request_within_budget(
+            app, client, "PATCH", "/api/flags/1/toggle",
+            json={"environment_id": environments[env_name], "reason": "budget check"}, headers=manager_headers
+        )
+
+
+@pytest.mark.parametrize("env_name", ["Development", "Production"])
+def test_release_train_budget_scales_with_targets(app, client, manager_headers, environments, env_name):
+    targets = [{"flag_id": flag_id, "environment_id": environments[env_name]} for flag_id in range(20, 32)]
+    request_within_budget(
+        app, client, "POST", "/api/flags/toggle-batch", items=len(targets),
+        json={"targets": targets, "reason": "release train"}, headers=manager_headers
+    )
+
+
+def test_evaluate(app, client):
+    request_within_budget(app, client, "GET", "/api/flags/evaluate/flag_1?env=production&user=visitor-1")
+
+
+def test_read_endpoints(app, client, developer_headers):
+    flag_routes._cache["analytics"]["expiry"] = flag_routes._cache["logs"]["expiry"] = 0
+    heatmap.invalidate()
+    dashboard.invalidate()
+    for url in (
+        "/api/flags/analytics",
+        "/api/flags/logs",
+        "/api/flags/logs/risk?min_score=8",
+        "/api/flags/risk-heatmap",
+        "/api/flags/summary",
+    ):
+        request_within_budget(app, client, "GET", url, headers=developer_headers)
+
+
+def test_raise_mode_fails_before_the_statement_runs(app):
+    @query_budget(1)
+    def create_two():
+        db.session.execute(insert(Environment), [{"name": "Budget A"}])
+        db.session.execute(insert(Environment), [{"name": "Budget B"}])
+        db.session.commit()
+
+    with app.test_request_context():
+        with pytest.raises(QueryBudgetExceeded):
+            create_two()
+        db.session.rollback()
+        assert db.session.scalar(select(func.count()).where(Environment.name.like("Budget %"))) == 0
+
+
+def test_raise_mode_blocks_commit_after_a_swallowed_violation(app):
+    @query_budget(1)
+    def create_two():
+        db.session.execute(insert(Environment), [{"name": "Budget C"}])
+        try:
+            db.session.execute(insert(Environment), [{"name": "Budget D"}])
+        except QueryBudgetExceeded:
+            pass
+        db.session.commit()
+
+    with app.test_request_context():
+        with pytest.raises(QueryBudgetExceeded):
+            create_two()
+        db.session.rollback()
+        assert db.session.scalar(select(func.count()).where(Environment.name.like("Budget %"))) == 0
+
+
+def test_warn_mode_logs_and_completes(app, caplog):
+    @query_budget(0)
+    def count_environments():
+        return db.session.scalar(select(func.count(Environment.id)))
+
+    app.config["QUERY_BUDGET_MODE"] = "warn"
+    try:
+        with app.test_request_context(), caplog.at_level(logging.WARNING, logger="app.utils.query_budget"):
+            assert count_environments() >= 3
+    finally:
+        app.config["QUERY_BUDGET_MODE"] = None
+    assert "Query budget exceeded" in caplog.text
@@ -0,0 +1,51 @@
+from app import db
+from app.models import AuditLog, FlagStatus
+from app.services.ai_agent import AIAgent
+
+FLAG_IDS = (33, 34, 35, 36)
+
+
+def _snapshot(app, env_id):
+    with app.app_context():
+        statuses = {
+            s.flag_id: (s.is_enabled, s.version)
+            for s in FlagStatus.query.filter(FlagStatus.flag_id.in_(FLAG_IDS), FlagStatus.env_id == env_id)
+        }
+        toggles = AuditLog.query.filter(AuditLog.flag_id.in_(FLAG_IDS), AuditLog.action.like("TOGGLE_%")).count()
+        return statuses, toggles
+
+
+def test_one_stale_target_rolls_back_the_whole_train(app, client, manager_headers, environments):
+    env_id = environments["Staging"]
+    before = _snapshot(app, env_id)
+    statuses, _ = before
+    targets = [
+        {"flag_id": flag_id, "environment_id": env_id, "expected_version": statuses[flag_id][1]}
+        for flag_id in FLAG_IDS
+    ]
+    targets[2]["expected_version"] += 1  # a change this client has not seen
+
+    response = client.post("/api/flags/toggle-batch", json={"targets": targets, "reason": "release train"}, headers=manager_headers)
+
+    assert response.status_code == 409
+    assert response.get_json()["data"]["details"]["flag_id"] == FLAG_IDS[2]
+    assert _snapshot(app, env_id) == before
+
+
+def test_ai_block_on_one_target_toggles_nothing(app, client, developer_headers, environments, monkeypatch):
+    monkeypatch.setattr(AIAgent, "get_batch_risk_report", classmethod(
+        lambda cls, changes: {"risk_score": 9, "risk_level": "high", "advice": "Too risky"}
+    ))
+    targets = [{"flag_id": FLAG_IDS[0], "environment_id": environments["Development"]}] + [
+        {"flag_id": flag_id, "environment_id": environments["Production"]} for flag_id in FLAG_IDS[1:]
+    ]
+    dev_before = _snapshot(app, environments["Development"])[0]
+    prod_before = _snapshot(app, environments["Production"])[0]
+
+    response = client.post("/api/flags/toggle-batch", json={"targets": targets, "reason": "release train"}, headers=developer_headers)
+
+    assert response.status_code == 403
+    assert _snapshot(app, environments["Development"])[0] == dev_before
+    assert _snapshot(app, environments["Production"])[0] == prod_before
+    with app.app_context():
+        assert db.session.query(AuditLog).filter(AuditLog.action == "AI_BLOCK", AuditLog.flag_id.in_(FLAG_IDS[1:])).count() == 3
@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+import pytest
+from app.services.risk_heatmap import heatmap
+
+
+def test_toggle_shows_on_the_next_read(client, manager_headers, developer_headers, environments):
+    before = client.get("/api/flags/risk-heatmap", headers=developer_headers).get_json()["data"]
+    row = next(i for i, flag in enumerate(before["flags"]) if flag["id"] == 40)
+    column = before["environments"].index("Staging")
+
+    response = client.patch(
+        "/api/flags/40/toggle", json={"environment_id": environments["Staging"], "reason": "heatmap check"},
+        headers=manager_headers
+    )
+    assert response.status_code == 200
+
+    after = client.get("/api/flags/risk-heatmap", headers=developer_headers).get_json()["data"]
+    assert after["version"] > before["version"]
+    assert after["enabled"][row][column] != before["enabled"][row][column]
+
+
+def test_published_state_never_changes_under_a_reader(app, client, manager_headers, environments):
+    with app.app_context():
+        state = heatmap.get()
+    document = state.to_document()
+    with pytest.raises(ValueError):
+        state.scores[0, 0] = 1
+
+    errors = []
+
+    def read():
+        for _ in range(200):
+            current = heatmap.state
+            try:
+                rows = len(current.flag_ids)
+                assert current.scores.shape[0] == current.enabled.shape[0] == current.hits.shape[0] == rows
+                assert len(current.keys) == rows
+                current.to_document(min_score=1)
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for flag_id in range(41, 46):
+        client.patch(
+            f"/api/flags/{flag_id}/toggle", json={"environment_id": environments["Development"], "reason": "heatmap check"},
+            headers=manager_headers
+        )
+        with app.app_context():
+            heatmap.get()
+    reader.join()
+
+    assert not errors
+    assert state.to_document() == document
+    assert heatmap.state.version > state.version
+    assert not np.array_equal(heatmap.state.enabled, state.enabled)
+
+
+def test_readers_get_the_published_state_while_a_refresh_runs(app):
+    with app.app_context():
+        state = heatmap.get()
+        heatmap.invalidate()
+        with heatmap._lock:  # another thread is refreshing
+            assert heatmap.get() is state
+        heatmap.get()
+        assert not heatmap._due()  # the next reader ran the refresh
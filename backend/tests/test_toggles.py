@@ -0,0 +1,55 @@
+from sqlalchemy import text
+from app import db
+
+TOGGLE = {"reason": "version check"}
+
+
+def _toggle(client, headers, flag_id, env_id, if_match=None, **body):
+    if if_match is not None:
+        headers = {**headers, "If-Match": if_match}
+    return client.patch(f"/api/flags/{flag_id}/toggle", json={"environment_id": env_id, **TOGGLE, **body}, headers=headers)
+
+
+def test_stale_version_returns_409_and_changes_nothing(client, manager_headers, environments):
+    env_id = environments["Development"]
+    first = _toggle(client, manager_headers, 50, env_id)
+    assert first.status_code == 200
+    version = first.get_json()["data"]["version"]
+    assert first.headers["ETag"] == f'"{version}"'
+
+    stale = _toggle(client, manager_headers, 50, env_id, if_match=f'"{version - 1}"')
+    assert stale.status_code == 409
+    assert stale.get_json()["data"]["details"] == {"current_version": version}
+
+    stale_body = _toggle(client, manager_headers, 50, env_id, expected_version=version - 1)
+    assert stale_body.status_code == 409
+
+    current = _toggle(client, manager_headers, 50, env_id, if_match=f'W/"{version}"')
+    assert current.status_code == 200
+    assert current.get_json()["data"]["version"] == version + 1
+    assert current.get_json()["data"]["is_enabled"] != first.get_json()["data"]["is_enabled"]
+
+
+def test_malformed_if_match_returns_400(client, manager_headers, environments):
+    response = _toggle(client, manager_headers, 50, environments["Development"], if_match="not-a-version")
+    assert response.status_code == 400
+
+
+def test_upgrade_adds_the_version_column_to_existing_statuses(database_app, tmp_path):
+    import upgrade_db
+
+    app = database_app(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with app.app_context():
+        # A database created before flag_statuses carried a version
+        db.create_all(bind_key=None)
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE flag_statuses DROP COLUMN version"))
+            conn.execute(text("INSERT INTO feature_flags (key, name) VALUES ('legacy_flag', 'Legacy')"))
+            conn.execute(text("INSERT INTO environments (name) VALUES ('Production')"))
+            conn.execute(text("INSERT INTO flag_statuses (flag_id, env_id, is_enabled) VALUES (1, 1, 1)"))
+
+    upgrade_db.upgrade(app)
+    upgrade_db.upgrade(app)  # re-runnable
+
+    with app.app_context():
+        assert db.session.execute(text("SELECT version FROM flag_statuses")).scalar() == 1
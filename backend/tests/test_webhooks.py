@@ -0,0 +1,160 @@
+import hmac
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app import db
+from app.models import WebhookSubscription, WebhookOutbox, WebhookDelivery
+from app.services import webhook_service
+from app.services.webhook_service import WebhookService, delivery_pool, MAX_ATTEMPTS
+
+SECRET = "test-signing-secret-0123456789"
+
+
+class Receiver:
+    """Local HTTP receiver. Paths pick the behaviour: /ok/*, /fail/* (500) and /slow/* (held until released)."""
+
+    def __init__(self):
+        self.requests = []        # (path, events, signature valid)
+        self.in_flight = {}       # path -> current concurrent requests
+        self.peak = {}            # path -> highest concurrent requests seen
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                expected = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+                with receiver._lock:
+                    receiver.in_flight[self.path] = receiver.in_flight.get(self.path, 0) + 1
+                    receiver.peak[self.path] = max(receiver.peak.get(self.path, 0), receiver.in_flight[self.path])
+                    receiver.requests.append((self.path, json.loads(body)["events"], self.headers["X-SafeConfig-Signature"] == expected))
+                if self.path.startswith("/slow"):
+                    receiver.release.wait(10)
+                with receiver._lock:
+                    receiver.in_flight[self.path] -= 1
+                self.send_response(500 if self.path.startswith("/fail") else 200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events_for(self, path):
+        return [event["id"] for p, events, _ in self.requests if p == path for event in events]
+
+
+@pytest.fixture
+def receiver(app, monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    with app.app_context():
+        for model in (WebhookDelivery, WebhookOutbox, WebhookSubscription):
+            db.session.query(model).delete()
+        db.session.commit()
+    receiver = Receiver()
+    yield receiver
+    receiver.release.set()
+    _settle()
+    receiver.server.shutdown()
+
+
+def _settle(timeout=10):
+    """Waits for in-flight POSTs and discards their outcomes."""
+    deadline = time.monotonic() + timeout
+    while delivery_pool.capacity() < delivery_pool.max_workers and time.monotonic() < deadline:
+        time.sleep(0.02)
+    delivery_pool.drain()
+
+
+def _subscribe(url, max_concurrency=2):
+    subscription = WebhookSubscription(url=url, secret=SECRET, max_concurrency=max_concurrency)
+    db.session.add(subscription)
+    db.session.commit()
+    return subscription.id
+
+
+def _publish(count):
+    db.session.add_all([WebhookOutbox(event_type="flag.toggled", payload={"n": i}) for i in range(count)])
+    db.session.commit()
+    return WebhookService.fan_out()
+
+
+def _pass_until(done, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not done():
+        assert time.monotonic() < deadline, "webhook deliveries did not settle"
+        WebhookService.deliver_due()
+        time.sleep(0.02)
+
+
+def _statuses(subscription_id):
+    return [d.status for d in WebhookDelivery.query.filter_by(subscription_id=subscription_id)]
+
+
+def test_fan_out_batches_and_signs_per_subscriber(app, receiver):
+    with app.app_context():
+        first, second = _subscribe(receiver.url + "/ok/a"), _subscribe(receiver.url + "/ok/b")
+        assert _publish(3) == 3
+        assert WebhookDelivery.query.count() == 6
+
+        _pass_until(lambda: _statuses(first) + _statuses(second) == ["delivered"] * 6)
+
+    assert len(receiver.requests) == 2  # one batched POST per subscriber
+    assert sorted(receiver.events_for("/ok/a")) == sorted(receiver.events_for("/ok/b"))
+    assert all(valid for _, _, valid in receiver.requests)
+
+
+def test_failures_back_off_then_die(app, receiver):
+    with app.app_context():
+        subscription = _subscribe(receiver.url + "/fail")
+        _publish(1)
+        _pass_until(lambda: WebhookDelivery.query.filter_by(subscription_id=subscription).one().attempts == 1)
+
+        delivery = WebhookDelivery.query.filter_by(subscription_id=subscription).one()
+        assert delivery.status == "pending" and delivery.last_error == "HTTP 500" and delivery.lease_id is None
+        delay = (delivery.next_attempt_at - datetime.utcnow()).total_seconds()
+        assert 1 < delay <= webhook_service.BACKOFF_BASE_SECONDS
+
+        WebhookService.deliver_due()
+        assert len(receiver.requests) == 1  # not due again until the backoff passes
+
+        delivery.attempts, delivery.next_attempt_at = MAX_ATTEMPTS - 1, datetime.utcnow()
+        db.session.commit()
+        _pass_until(lambda: _statuses(subscription) == ["dead"])
+
+
+def test_expired_lease_is_reclaimed_and_the_stale_outcome_ignored(app, receiver):
+    with app.app_context():
+        subscription = _subscribe(receiver.url + "/ok/lease")
+        _publish(2)
+        [(_, items, stale_lease)] = WebhookService._claim(subscription, 1)  # a worker that then died
+
+        WebhookDelivery.query.update({WebhookDelivery.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        _pass_until(lambda: _statuses(subscription) == ["delivered"] * 2)
+
+        assert WebhookService._record_outcomes([(stale_lease, [item[0] for item in items], "HTTP 502")]) == 0
+        assert _statuses(subscription) == ["delivered"] * 2
+
+
+def test_concurrency_cap_holds_across_workers_and_slow_subscribers_block_no_one(app, receiver, monkeypatch):
+    monkeypatch.setattr(webhook_service, "EVENTS_PER_REQUEST", 1)
+    with app.app_context():
+        slow = _subscribe(receiver.url + "/slow", max_concurrency=2)
+        fast = _subscribe(receiver.url + "/ok/fast", max_concurrency=2)
+        _publish(6)
+
+        _pass_until(lambda: _statuses(fast) == ["delivered"] * 6 and receiver.in_flight.get("/slow") == 2)
+        assert WebhookService._claim(slow, 10) == []  # a second worker finds no free slot
+
+        receiver.release.set()
+        _pass_until(lambda: _statuses(slow) == ["delivered"] * 6)
+
+    assert receiver.peak["/slow"] == 2
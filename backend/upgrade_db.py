@@ -0,0 +1,93 @@
+from sqlalchemy import inspect, select, text, update
+from app import create_app, db
+from app.models import FeatureFlag, AuditLog, FlagStatus, WebhookDelivery, CATALOG_SEARCH_EXTENSION, CATALOG_SEARCH_INDEXES
+from loguru import logger
+
+# In-place upgrade for databases created before the schema changes below
+# (tables are created with db.create_all(), which never alters existing tables).
+# Safe to re-run: every step checks what is already there.
+#   python upgrade_db.py
+BACKFILL_BATCH = 1000
+
+# (table, column, DDL) added to tables that already existed
+COLUMNS = [
+    ("flag_statuses", "version", "ALTER TABLE flag_statuses ADD COLUMN version INTEGER NOT NULL DEFAULT 1"),
+    ("audit_logs", "ai_report_id", "ALTER TABLE audit_logs ADD COLUMN ai_report_id INTEGER REFERENCES ai_reports (id)"),
+    ("audit_logs", "risk_score", "ALTER TABLE audit_logs ADD COLUMN risk_score INTEGER"),
+    ("audit_logs", "risk_level", "ALTER TABLE audit_logs ADD COLUMN risk_level VARCHAR(20)"),
+    ("webhook_deliveries", "lease_id", "ALTER TABLE webhook_deliveries ADD COLUMN lease_id VARCHAR(32)"),
+]
+
+# Model indexes on tables that already existed
+INDEXED_MODELS = [FeatureFlag, FlagStatus, AuditLog, WebhookDelivery]
+
+
+def add_columns():
+    inspector = inspect(db.engine)
+    for table, column, ddl in COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            db.session.execute(text(ddl))
+            logger.info(f"Added {table}.{column}")
+    db.session.commit()
+
+
+def create_indexes():
+    for model in INDEXED_MODELS:
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    # Catalog search indexes are Postgres-only raw DDL (see models.py)
+    if db.engine.dialect.name == "postgresql":
+        for statement in (CATALOG_SEARCH_EXTENSION,) + CATALOG_SEARCH_INDEXES:
+            db.session.execute(text(statement))
+        db.session.commit()
+
+
+def backfill_audit_risk():
+    """
+    Promotes risk_score / risk_level out of the legacy inline ai_metadata JSON, so
+    ledger rows written before those columns existed show up in /logs/risk.
+    """
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(AuditLog.id, AuditLog.ai_metadata).where(
+                AuditLog.id > last_id,
+                AuditLog.risk_score.is_(None),
+                AuditLog.ai_metadata.isnot(None)
+            ).order_by(AuditLog.id).limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        changes = []
+        for row_id, metadata in rows:
+            if not isinstance(metadata, dict):
+                continue
+            try:
+                risk_score = int(metadata.get("risk_score"))
+            except (TypeError, ValueError):
+                continue
+            risk_level = str(metadata.get("risk_level") or "")[:20] or None
+            changes.append({"id": row_id, "risk_score": risk_score, "risk_level": risk_level})
+
+        if changes:
+            db.session.execute(update(AuditLog), changes)
+        db.session.commit()
+        updated += len(changes)
+    logger.info(f"Backfilled risk columns on {updated} ledger rows")
+
+
+def upgrade(app=None):
+    app = app or create_app()
+    with app.app_context():
+        db.create_all(bind_key=None)  # New tables (e.g. ai_reports) before columns that reference them; primary only
+        add_columns()
+        create_indexes()
+        backfill_audit_risk()
+    logger.info("Database upgrade complete")
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,34 @@
+import os
+import time
+from app import create_app
+from app.services.webhook_service import WebhookService
+from loguru import logger
+
+# Webhook delivery worker. Run alongside the API (one or more instances):
+#   python worker.py
+# Each pass fans new outbox rows out to subscribers, then sends due deliveries.
+# Rows are claimed with SKIP LOCKED + a lease, so several workers can run in parallel;
+# each subscriber's max_concurrency holds across all of them.
+app = create_app()
+
+POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", 1.0))
+
+def run_forever():
+    logger.info("SafeConfig webhook worker live")
+    with app.app_context():
+        while True:
+            try:
+                fanned = WebhookService.fan_out()
+                sent = WebhookService.deliver_due()
+            except Exception as e:
+                from app import db
+                db.session.rollback()
+                logger.error(f"Webhook worker pass failed: {e}")
+                fanned = sent = 0
+
+            # Only sleep when idle so a backlog drains at full speed
+            if not fanned and not sent:
+                time.sleep(POLL_INTERVAL)
+
+if __name__ == "__main__":
+    run_forever()
@@ -2,7 +2,7 @@
 
 import React, { useEffect, useState, useCallback } from 'react';
 import { useAuth } from '@/context/AuthContext';
-import api from '@/lib/api';
+import { fetchSummary, trafficFromSummary } from '@/lib/api';
 import Navbar from '@/components/Navbar';
 import TrafficHUD from '@/components/TrafficHUD';
 import { 
@@ -35,20 +35,16 @@ export default function AnalyticsPage() {
 
     /**
      * UNIFIED DATA FETCH
-     * Aggregates traffic hits and audit logs to compute system performance.
+     * One conditional GET of the dashboard summary (24h traffic per flag and the
+     * recent ledger); a 304 reuses the last copy instead of re-downloading it.
      */
     const fetchData = useCallback(async () => {
         setFetching(true);
         try {
-            const [trafficRes, logsRes] = await Promise.all([
-                api.get('/flags/analytics'),
-                api.get('/flags/logs'),
-            ]);
+            const summary = await fetchSummary();
+            const logsData: AuditEntry[] = summary.ledger;
 
-            const trafficData = trafficRes.data.data || [];
-            const logsData: AuditEntry[] = logsRes.data.data || [];
-
-            setTraffic(trafficData);
+            setTraffic(trafficFromSummary(summary));
             setAuditStats({
                 total: logsData.length,
                 blocks: logsData.filter(l => l.action.includes('BLOCK')).length,
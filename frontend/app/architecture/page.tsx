@@ -127,6 +127,7 @@ export default function ArchitecturePage() {
                                     { m: 'GET', e: '/api/flags/evaluate/:key', r: 'EXTERNAL', f: 'Blast Radius Telemetry Ingestion' },
                                     { m: 'GET', e: '/api/flags/analytics', r: 'AUTH_SESSION', f: 'SQL Aggregation for Real-time HUD' },
                                     { m: 'GET', e: '/api/flags/logs', r: 'AUTH_SESSION', f: 'Audit Trail (JSONB Metadata Parsing)' },
+                                    { m: 'GET', e: '/api/flags/summary', r: 'AUTH_SESSION', f: 'Versioned Dashboard Document (ETag / 304)' },
                                 ].map((row, i) => (
                                     <tr key={i} className="hover:bg-blue-500/[0.03] transition-colors group">
                                         <td className="px-10 py-6 font-mono text-blue-500 font-black text-xs tracking-tighter">{row.m}</td>
@@ -1,15 +1,15 @@
 "use client";
 
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState, useCallback, useRef, useMemo } from 'react';
 import { useAuth } from '@/context/AuthContext';
-import api from '@/lib/api';
+import { fetchFlagPage, fetchSummary, trafficFromSummary, DashboardSummary } from '@/lib/api';
 import FlagCard from '@/components/FlagCard';
 import CreateFlagModal from '@/components/CreateFlagModal';
 import AuditLog from '@/components/AuditLog';
 import TrafficHUD from '@/components/TrafficHUD';
 import {
   Plus, RefreshCcw, LayoutDashboard, Terminal,
-  Flag, ShieldAlert, Zap, Loader2
+  Flag, ShieldAlert, Zap, Loader2, Search
 } from 'lucide-react';
 
 /**
@@ -21,30 +21,28 @@ export default function UnifiedDashboard() {
   
   // Centralized State
   const [flags, setFlags] = useState<any[]>([]);
-  const [analytics, setAnalytics] = useState<any[]>([]);
-  const [logs, setLogs] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
+  const [search, setSearch] = useState('');
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
   
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isFetching, setIsFetching] = useState(true);
   const [lastSynced, setLastSynced] = useState<Date | null>(null);
 
+  // Read by the registry loader without re-creating it on every keystroke
+  const searchRef = useRef('');
+  const sentinel = useRef<HTMLDivElement | null>(null);
+
   /**
    * THE SINGLE PULSE
-   * Hits all telemetry endpoints in parallel. 
-   * Cuts network overhead by 66% compared to individual component fetching.
+   * One conditional GET of the dashboard summary: counts, traffic, the audit stream
+   * and live flag states. Answered with a 304 (no body) while nothing changed.
    */
   const syncDashboard = useCallback(async () => {
     setIsFetching(true);
     try {
-      const [flagsRes, analyticsRes, logsRes] = await Promise.all([
-        api.get('/flags'),
-        api.get('/flags/analytics'),
-        api.get('/flags/logs')
-      ]);
-
-      setFlags(flagsRes.data.data || []);
-      setAnalytics(analyticsRes.data.data || []);
-      setLogs(logsRes.data.data || []);
+      setSummary(await fetchSummary());
       setLastSynced(new Date());
     } catch (err) {
       console.error("Critical Telemetry Sync Failure:", err);
@@ -53,15 +51,89 @@ export default function UnifiedDashboard() {
     }
   }, []);
 
+  /**
+   * The registry grid pages through /flags: the first page on load, search or a new
+   * flag, further pages as the list is scrolled. Pulses only refresh its states.
+   */
+  const loadRegistry = useCallback(async () => {
+    try {
+      const page = await fetchFlagPage({ q: searchRef.current });
+      setFlags(page.flags);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Registry page load failure:", err);
+    }
+  }, []);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await fetchFlagPage({ cursor: nextCursor, q: searchRef.current });
+      setFlags(prev => {
+        const seen = new Set(prev.map((f: any) => f.id));
+        return [...prev, ...page.flags.filter((f: any) => !seen.has(f.id))];
+      });
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Registry page load failure:", err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  }, [nextCursor, isLoadingMore]);
+
+  const reloadAll = useCallback(() => {
+    loadRegistry();
+    syncDashboard();
+  }, [loadRegistry, syncDashboard]);
+
+  // Infinite scroll: the next page loads when the end of the grid comes into view
+  useEffect(() => {
+    const node = sentinel.current;
+    if (!node || !nextCursor) return;
+    const observer = new IntersectionObserver(entries => {
+      if (entries[0].isIntersecting) loadMore();
+    }, { rootMargin: '400px' });
+    observer.observe(node);
+    return () => observer.disconnect();
+  }, [nextCursor, loadMore]);
+
+  // Search runs server-side: restart from the first page (debounced)
+  useEffect(() => {
+    if (isLoading || !role || search === searchRef.current) return;
+    const timer = setTimeout(() => {
+      searchRef.current = search;
+      loadRegistry();
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search, role, isLoading, loadRegistry]);
+
   useEffect(() => {
     if (!isLoading && role) {
-      syncDashboard();
+      reloadAll();
       
       // Industry standard 30s pulse for non-critical HUDs
       const pulse = setInterval(syncDashboard, 30000); 
       return () => clearInterval(pulse);
     }
-  }, [role, isLoading, syncDashboard]);
+  }, [role, isLoading, reloadAll, syncDashboard]);
+
+  // Loaded cards with the live states from the latest summary laid over them
+  const liveFlags = useMemo(() => {
+    if (!summary) return flags;
+    const live = new Map(summary.flags.map(f => [f.id, f]));
+    return flags.map((flag: any) => {
+      const current = live.get(flag.id);
+      if (!current) return flag;
+      return {
+        ...flag,
+        statuses: flag.statuses?.map((s: any) => ({
+          ...s,
+          is_enabled: current.statuses[s.environment_name]?.is_enabled ?? s.is_enabled
+        }))
+      };
+    });
+  }, [flags, summary]);
 
   if (isLoading) {
     return (
@@ -82,14 +154,13 @@ export default function UnifiedDashboard() {
     );
   }
 
-  // Derived Telemetry
-  const totalFlags = flags.length;
-  const activeEnvs = flags.reduce((sum: number, f: any) =>
-    sum + (f.statuses?.filter((s: any) => s.is_enabled).length || 0), 0
-  );
-  const totalEnvs = flags.reduce((sum: number, f: any) =>
-    sum + (f.statuses?.length || 0), 0
-  );
+  // Derived Telemetry (whole catalog, from the summary)
+  const summaryStatuses = summary?.flags.flatMap(f => Object.values(f.statuses)) ?? [];
+  const totalFlags = summary ? summary.flags.length : flags.length;
+  const activeEnvs = summaryStatuses.filter(s => s.is_enabled).length;
+  const totalEnvs = summaryStatuses.length;
+  const traffic = summary ? trafficFromSummary(summary) : [];
+  const logs = summary?.ledger ?? [];
 
   return (
     <div className="animate-in fade-in slide-in-from-bottom-4 duration-1000">
@@ -167,11 +238,22 @@ export default function UnifiedDashboard() {
 
           {/* Flag Grid */}
           <div className="space-y-6">
-            <div className="flex items-center justify-between px-2">
+            <div className="flex items-center justify-between gap-4 px-2">
                <h2 className="text-xs font-black text-slate-500 uppercase tracking-[0.3em]">Feature Registry</h2>
-               {lastSynced && (
-                 <span className="text-[9px] font-mono text-slate-700 italic">Synced: {lastSynced.toLocaleTimeString()}</span>
-               )}
+               <div className="flex items-center gap-4">
+                 <label className="flex items-center gap-2 px-3 py-2 rounded-xl bg-slate-900/50 border border-slate-800/60">
+                   <Search className="w-3.5 h-3.5 text-slate-600" />
+                   <input
+                     value={search}
+                     onChange={(e) => setSearch(e.target.value)}
+                     placeholder="Search key or name"
+                     className="bg-transparent text-xs text-white placeholder:text-slate-600 outline-none w-40"
+                   />
+                 </label>
+                 {lastSynced && (
+                   <span className="text-[9px] font-mono text-slate-700 italic">Synced: {lastSynced.toLocaleTimeString()}</span>
+                 )}
+               </div>
             </div>
 
             {isFetching && flags.length === 0 ? (
@@ -182,15 +264,21 @@ export default function UnifiedDashboard() {
               </div>
             ) : (
               <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
-                {flags.map((flag: any) => (
+                {liveFlags.map((flag: any) => (
                   <FlagCard key={flag.id} flag={flag} onUpdate={syncDashboard} />
                 ))}
               </div>
             )}
+
+            {nextCursor && (
+              <div ref={sentinel} className="flex justify-center py-4">
+                <Loader2 className={`w-5 h-5 text-slate-700 ${isLoadingMore ? 'animate-spin' : ''}`} />
+              </div>
+            )}
           </div>
 
           {/* Traffic HUD - NOW RECEIVING PROPS */}
-          <TrafficHUD trafficData={analytics} isSyncing={isFetching} />
+          <TrafficHUD trafficData={traffic} isSyncing={isFetching} />
         </div>
 
         {/* Right Section: Audit Stream - NOW RECEIVING PROPS */}
@@ -202,7 +290,7 @@ export default function UnifiedDashboard() {
       <CreateFlagModal 
         isOpen={isModalOpen} 
         onClose={() => setIsModalOpen(false)} 
-        onSuccess={syncDashboard} 
+        onSuccess={reloadAll} 
       />
     </div>
   );
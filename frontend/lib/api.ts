@@ -78,4 +78,68 @@ api.interceptors.response.use(
   }
 );
 
+/**
+ * FLAG CATALOG
+ * /flags is keyset-paginated server-side (at most 500 per page). Fetches one page;
+ * pass the returned cursor back for the next one (e.g. when the list is scrolled
+ * to its end) instead of pulling the whole catalog up front.
+ */
+export const FLAG_PAGE_SIZE = 50;
+
+export interface FlagPage {
+  flags: any[];
+  nextCursor?: string;
+}
+
+export async function fetchFlagPage(
+  { cursor, q, limit = FLAG_PAGE_SIZE }: { cursor?: string; q?: string; limit?: number } = {}
+): Promise<FlagPage> {
+  const res = await api.get('/flags', { params: { limit: Math.min(limit, 500), cursor, q: q || undefined } });
+  return { flags: res.data.data || [], nextCursor: res.headers['x-next-cursor'] };
+}
+
+/**
+ * DASHBOARD SUMMARY
+ * One pre-built document with every flag's state per environment, 24h hits and the
+ * recent ledger. Polled conditionally: the last ETag goes back as If-None-Match and a
+ * 304 (nothing changed) reuses the copy already held here, shared by every page.
+ */
+export interface SummaryFlag {
+  id: number;
+  key: string;
+  name: string;
+  description: string;
+  statuses: Record<string, { environment_id: number; is_enabled: boolean; version: number; updated_at: string }>;
+  hits_24h: Record<string, number>;
+  latest_audit: any | null;
+  last_risk: { score: number; level: string; env_name: string; action: string; timestamp: string } | null;
+}
+
+export interface DashboardSummary {
+  window_hours: number;
+  environments: string[];
+  flags: SummaryFlag[];
+  ledger: any[];
+}
+
+let lastSummary: { etag?: string; data?: DashboardSummary } = {};
+
+export async function fetchSummary(): Promise<DashboardSummary> {
+  const res = await api.get('/flags/summary', {
+    headers: lastSummary.etag ? { 'If-None-Match': lastSummary.etag } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  });
+  if (res.status === 200) {
+    lastSummary = { etag: res.headers['etag'], data: res.data.data };
+  }
+  return lastSummary.data as DashboardSummary;
+}
+
+/** Per-flag 24h hits across environments, in the shape TrafficHUD renders (flags with traffic only). */
+export function trafficFromSummary(summary: DashboardSummary): { key: string; hits: number }[] {
+  return summary.flags
+    .map(f => ({ key: f.key, hits: Object.values(f.hits_24h).reduce((sum, n) => sum + n, 0) }))
+    .filter(t => t.hits > 0);
+}
+
 export default api;
\ No newline at end of file